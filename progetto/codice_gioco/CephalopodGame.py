@@ -1,7 +1,8 @@
 import tkinter as tk
 from tkinter import simpledialog, messagebox
 from tkinter import ttk
-import random, itertools, copy, concurrent.futures, threading, time
+import random, itertools, copy, concurrent.futures, threading, time, weakref
+from collections import namedtuple
 
 #import sys
 #sys.path.append("Progetti studenti maggio 2025")
@@ -37,8 +38,13 @@ class Game:
         raise NotImplementedError
 
 # Classe che rappresenta lo stato della board.
+# Due board sono uguali se hanno lo stesso contenuto e lo stesso giocatore di turno;
+# l'hash è la chiave di Zobrist `key`, aggiornata in modo incrementale da result e make_move.
+# Allo stesso modo vengono aggiornati i contatori delle celle vuote (`empty`), delle celle
+# (`pieces`) e dei pip (`pips`) di ogni giocatore, così is_full e count costano O(1).
+# Non modificare board.board direttamente: chiave e contatori non sarebbero più validi.
 class Board:
-    def __init__(self, size, board=None, to_move="Blue", last_move=None):
+    def __init__(self, size, board=None, to_move="Blue", last_move=None, key=None):
         self.size = size
         if board is None:
             self.board = [[None for _ in range(size)] for _ in range(size)]
@@ -46,24 +52,595 @@ class Board:
             self.board = board
         self.to_move = to_move      # "Blue" o "Red"
         self.last_move = last_move  # (cella_inserimento, celle_catturate)
+        cells = [cell for row in self.board for cell in row]
+        if key is None:
+            key = zobrist_key(size, cells, to_move)
+        self.key = key
+        self.empty = cells.count(None)
+        self.pieces = {"Blue": 0, "Red": 0}
+        self.pips = {"Blue": 0, "Red": 0}
+        for cell in cells:
+            if cell is not None:
+                self.pieces[cell[0]] += 1
+                self.pips[cell[0]] += cell[1]
+        self.movegen = None  # MoveGenerator opzionale, vedi CephalopodGame.attach_movegen
 
     def copy(self):
-        new_board = [row[:] for row in self.board]
-        return Board(self.size, new_board, self.to_move, self.last_move)
+        new_state = Board.__new__(Board)
+        new_state.size = self.size
+        new_state.board = [row[:] for row in self.board]
+        new_state.to_move = self.to_move
+        new_state.last_move = self.last_move
+        new_state.key = self.key
+        new_state.empty = self.empty
+        new_state.pieces = self.pieces.copy()
+        new_state.pips = self.pips.copy()
+        new_state.movegen = None if self.movegen is None else self.movegen.copy()
+        return new_state
+
+    # Il MoveGenerator non entra nei pickle (processi, Pipe): chi riceve la board la usa senza,
+    # come se attach_movegen non fosse mai stato chiamato.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["movegen"] = None
+        return state
+
+    def __hash__(self):
+        return self.key
+
+    def __eq__(self, other):
+        if not isinstance(other, (Board, PackedBoard)):
+            return NotImplemented
+        return self.key == other.key and self.to_move == other.to_move and self.board == other.board
 
     def is_full(self):
-        for row in self.board:
-            if any(cell is None for cell in row):
-                return False
-        return True
+        return self.empty == 0
+
+    def get(self, r, c):
+        """Restituisce (player, pip) della cella (r, c) oppure None se vuota."""
+        return self.board[r][c]
 
     def count(self, player):
-        cnt = 0
-        for row in self.board:
-            for cell in row:
-                if cell is not None and cell[0] == player:
-                    cnt += 1
-        return cnt
+        return self.pieces[player]
+
+    def pip_count(self, player):
+        """Somma dei pip delle celle di player."""
+        return self.pips[player]
+
+    # Conversione verso la rappresentazione compatta (vedi PackedBoard).
+    def to_packed(self):
+        cells = blue = red = 0
+        for r in range(self.size):
+            for c in range(self.size):
+                cell = self.board[r][c]
+                if cell is not None:
+                    i = r * self.size + c
+                    player, pip = cell
+                    if player == "Blue":
+                        cells |= pip << (4 * i)
+                        blue |= 1 << i
+                    else:
+                        cells |= (pip | RED_BIT) << (4 * i)
+                        red |= 1 << i
+        return PackedBoard(self.size, cells, blue, red, self.to_move, self.last_move, self.key,
+                           (self.pips["Blue"], self.pips["Red"]))
+
+    def to_board(self):
+        return self
+
+    def to_frozen(self):
+        return FrozenBoard.make(self.size, bytes([0 if cell is None else PIECE_CODES[cell]
+                                                  for row in self.board for cell in row]), self.to_move, self.key)
+
+# Rappresentazione compatta della board.
+# Ogni cella occupa 4 bit dell'intero `cells` (cella i = r*size + c ai bit 4i..4i+3):
+# i 3 bit bassi contengono il pip (1-6), il bit alto vale 1 se la cella è del Red.
+# Le maschere `blue` e `red` hanno il bit i acceso se la cella i è occupata dal giocatore.
+RED_BIT = 8
+PIP_MASK = 7
+
+# Codice a 4 bit di ogni contenuto (player, pip) di una cella, come in PackedBoard.
+PIECE_CODES = {(player, pip): pip | (RED_BIT if player == "Red" else 0)
+               for player in ("Blue", "Red") for pip in range(1, 7)}
+
+_zobrist = {}
+
+# Chiavi di Zobrist per dimensione: zobrist_table(size)[0][i][codice] per ogni cella e contenuto
+# (il codice 0, cella vuota, vale 0) e zobrist_table(size)[1] per il turno del Red.
+# Il seme è fisso, così le chiavi sono le stesse in ogni esecuzione e in ogni processo.
+def zobrist_table(size):
+    if size not in _zobrist:
+        rng = random.Random(size)
+        cells = [[0] + [rng.getrandbits(64) for _ in range(15)] for _ in range(size * size)]
+        _zobrist[size] = (cells, rng.getrandbits(64))
+    return _zobrist[size]
+
+# Calcola da zero la chiave di una sequenza di celle (player, pip) o None in ordine di riga.
+def zobrist_key(size, cells, to_move):
+    table, red_to_move = zobrist_table(size)
+    key = red_to_move if to_move == "Red" else 0
+    for i, cell in enumerate(cells):
+        if cell is not None:
+            key ^= table[i][PIECE_CODES[cell]]
+    return key
+
+class BoardTables:
+    """Tabelle precalcolate per dimensione della board, condivise da Board e PackedBoard.
+    Per ogni cella i: coords[i] = (r, c), neighbours[i] gli indici delle celle adiacenti
+    (su, giù, sinistra, destra) e neighbour_coords[i] le loro coordinate; capture_cells[i]
+    associa a ogni sottoinsieme di adiacenti (maschera sulle posizioni in neighbours[i])
+    la tupla delle celle catturate.
+    Le mosse di una cella vuota dipendono solo dai pip adiacenti: si ottengono da CAPTURES
+    e si memorizzano in cell_moves[i] (chiave: tupla dei pip) e packed_moves[i]
+    (chiave: `cells & pip_masks[i]` di PackedBoard). move_masks associa a ogni mossa
+    i bit da accendere e spegnere in PackedBoard."""
+    _by_size = {}
+
+    def __init__(self, size):
+        self.size = size
+        self.full = (1 << (size * size)) - 1
+        self.coords = [divmod(i, size) for i in range(size * size)]
+        self.neighbours = []
+        for r in range(size):
+            for c in range(size):
+                self.neighbours.append(tuple((r+dr) * size + (c+dc) for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]
+                                             if 0 <= r+dr < size and 0 <= c+dc < size))
+        self.neighbour_coords = [tuple(self.coords[j] for j in adj) for adj in self.neighbours]
+        self.capture_cells = [{mask: tuple(pos for k, pos in enumerate(adj) if mask >> k & 1)
+                               for mask in range(1 << len(adj))}
+                              for adj in self.neighbour_coords]
+        self.pip_masks = [sum(PIP_MASK << (4 * j) for j in adj) for adj in self.neighbours]
+        self.cell_moves = [{} for _ in range(size * size)]
+        self.packed_moves = [{} for _ in range(size * size)]
+        self.move_masks = {}
+        self.dirty = {}
+        # Simmetrie della board (gruppo D4): symmetries[t][i] è la cella in cui la trasformazione t
+        # porta la cella i. t = 0 è l'identità, t = 1..3 le rotazioni di 90° in senso orario,
+        # t = 4..7 le stesse rotazioni seguite dal riflesso sinistra-destra.
+        self.symmetries = []
+        for t in range(8):
+            perm = []
+            for r, c in self.coords:
+                for _ in range(t % 4):
+                    r, c = c, size - 1 - r
+                if t >= 4:
+                    c = size - 1 - c
+                perm.append(r * size + c)
+            self.symmetries.append(tuple(perm))
+        self.inverse_symmetry = [next(u for u in range(8)
+                                      if all(self.symmetries[u][j] == i for i, j in enumerate(perm)))
+                                 for perm in self.symmetries]
+        self._cell_chunks = self._key_chunks = self._bit_chunks = None
+
+    @classmethod
+    def get(cls, size):
+        if size not in cls._by_size:
+            cls._by_size[size] = BoardTables(size)
+        return cls._by_size[size]
+
+    def moves_for(self, i, pips):
+        """Mosse legali che piazzano nella cella vuota i, dati i pip (0 se vuota) delle celle in neighbours[i]."""
+        moves = self.cell_moves[i].get(pips)
+        if moves is None:
+            cell = self.coords[i]
+            captures = self.capture_cells[i]
+            moves = tuple((cell, s, captures[mask]) for mask, s in CAPTURES[pips]) or ((cell, 1, ()),)
+            self.cell_moves[i][pips] = moves
+        return moves
+
+    def packed_moves_for(self, i, cells):
+        """Come moves_for, leggendo i pip adiacenti dall'intero `cells` di una PackedBoard."""
+        key = cells & self.pip_masks[i]
+        moves = self.packed_moves[i].get(key)
+        if moves is None:
+            moves = self.moves_for(i, tuple(cells >> (4 * j) & PIP_MASK for j in self.neighbours[i]))
+            self.packed_moves[i][key] = moves
+        return moves
+
+    def dirty_of(self, last_move):
+        """Maschera delle celle le cui mosse possono cambiare dopo la mossa last_move
+        (nel formato di Board.last_move): la cella di inserimento, le celle catturate e le loro adiacenti."""
+        dirty = self.dirty.get(last_move)
+        if dirty is None:
+            cell, captured = last_move
+            dirty = 0
+            for r, c in (cell,) + captured:
+                i = r * self.size + c
+                dirty |= 1 << i
+                for j in self.neighbours[i]:
+                    dirty |= 1 << j
+            self.dirty[last_move] = dirty
+        return dirty
+
+    # Le trasformazioni degli interi di PackedBoard usano tabelle per blocchi di 8 bit:
+    # _cell_chunks[t][k][b] è il contributo del byte k di `cells` che vale b (due celle),
+    # _key_chunks[t][k][b] il suo contributo alla chiave di Zobrist della board trasformata e
+    # _bit_chunks[t][k][b] quello del byte k di una maschera `blue`/`red` (otto celle).
+    def _build_chunks(self):
+        n_cells = self.size * self.size
+        table = zobrist_table(self.size)[0]
+        self._cell_chunks = []
+        self._key_chunks = []
+        self._bit_chunks = []
+        for perm in self.symmetries:
+            cell_chunks = []
+            key_chunks = []
+            for k in range((n_cells + 1) // 2):
+                cells = range(2 * k, min(2 * k + 2, n_cells))
+                cell_chunks.append([sum((b >> (4 * (i - 2 * k)) & 15) << (4 * perm[i]) for i in cells)
+                                    for b in range(256)])
+                keys = []
+                for b in range(256):
+                    key = 0
+                    for i in cells:
+                        key ^= table[perm[i]][b >> (4 * (i - 2 * k)) & 15]
+                    keys.append(key)
+                key_chunks.append(keys)
+            self._cell_chunks.append(cell_chunks)
+            self._key_chunks.append(key_chunks)
+            self._bit_chunks.append([[sum(1 << perm[i] for i in range(8 * k, min(8 * k + 8, n_cells))
+                                          if b >> (i - 8 * k) & 1) for b in range(256)]
+                                     for k in range((n_cells + 7) // 8)])
+
+    def _cell_bytes(self, cells):
+        return cells.to_bytes((self.size * self.size + 1) // 2, "little")
+
+    def transform_cells(self, cells, t):
+        """Applica la simmetria t all'intero `cells` di una PackedBoard."""
+        if self._cell_chunks is None:
+            self._build_chunks()
+        result = 0
+        for chunk, b in zip(self._cell_chunks[t], self._cell_bytes(cells)):
+            result |= chunk[b]
+        return result
+
+    def canonical_cells(self, cells):
+        """Restituisce (t, chiave delle celle) per la simmetria t che rende minimo l'intero `cells`
+        trasformato (a parità, la t più piccola); la chiave esclude il turno."""
+        if self._cell_chunks is None:
+            self._build_chunks()
+        data = self._cell_bytes(cells)
+        best = best_t = None
+        for t, chunks in enumerate(self._cell_chunks):
+            result = 0
+            for chunk, b in zip(chunks, data):
+                result |= chunk[b]
+            if best is None or result < best:
+                best, best_t = result, t
+        key = 0
+        for chunk, b in zip(self._key_chunks[best_t], data):
+            key ^= chunk[b]
+        return best_t, key
+
+    def transform_mask(self, mask, t):
+        """Applica la simmetria t a una maschera di celle (un bit per cella)."""
+        if self._bit_chunks is None:
+            self._build_chunks()
+        result = 0
+        for k, chunk in enumerate(self._bit_chunks[t]):
+            result |= chunk[mask >> (8 * k) & 255]
+        return result
+
+    def transform_positions(self, target, positions, t):
+        """Trasforma con t le celle catturate `positions`, adiacenti alla cella target già
+        trasformata, nell'ordine in cui compaiono nelle mosse generate per target."""
+        perm = self.symmetries[t]
+        moved = [self.coords[perm[r * self.size + c]] for r, c in positions]
+        order = self.neighbour_coords[target[0] * self.size + target[1]]
+        return tuple(sorted(moved, key=order.index))
+
+    def masks_of(self, move):
+        """Restituisce (bit della cella, nibble del Blue, nibble del Red, maschera celle catturate,
+        maschera bit catturati, indice della cella, indici delle celle catturate) per la mossa."""
+        masks = self.move_masks.get(move)
+        if masks is None:
+            (r, c), pip, captured = move
+            i = r * self.size + c
+            clear_cells = clear_bits = 0
+            for rr, cc in captured:
+                j = rr * self.size + cc
+                clear_cells |= 15 << (4 * j)
+                clear_bits |= 1 << j
+            masks = (1 << i, pip << (4 * i), (pip | RED_BIT) << (4 * i), ~clear_cells, ~clear_bits,
+                     i, tuple(rr * self.size + cc for rr, cc in captured))
+            self.move_masks[move] = masks
+        return masks
+
+    def move_code(self, move):
+        """Codifica una mossa in un intero: indice della cella << 7 | pip << 4 | maschera delle
+        celle catturate nell'ordine di neighbour_coords (16 bit fino a board 22x22)."""
+        (r, c), pip, captured = move
+        i = r * self.size + c
+        neighbours = self.neighbour_coords[i]
+        mask = 0
+        for pos in captured:
+            mask |= 1 << neighbours.index(pos)
+        return i << 7 | pip << 4 | mask
+
+    def code_move(self, code):
+        """Inverso di move_code."""
+        i = code >> 7
+        return self.coords[i], code >> 4 & 7, self.capture_cells[i][code & 15]
+
+class PackedBoard:
+    """Board compatta basata su interi: copiarla o derivarne una nuova costa poche
+    operazioni aritmetiche invece della copia di tutte le righe.
+    Si ottiene con Board.to_packed() e si riconverte con to_board(); CephalopodGame
+    lavora nativamente su entrambe le rappresentazioni e le mosse hanno lo stesso formato.
+    Celle vuote e celle per giocatore si contano sulle maschere; le somme dei pip
+    (`blue_pips`, `red_pips`) sono aggiornate da result e make_move come in Board."""
+    __slots__ = ("size", "cells", "blue", "red", "to_move", "last_move", "key",
+                 "blue_pips", "red_pips", "movegen", "_rows")
+
+    def __init__(self, size, cells=0, blue=0, red=0, to_move="Blue", last_move=None, key=None, pips=None):
+        self.size = size
+        self.cells = cells
+        self.blue = blue
+        self.red = red
+        self.to_move = to_move
+        self.last_move = last_move
+        if key is None:
+            table, red_to_move = zobrist_table(size)
+            key = red_to_move if to_move == "Red" else 0
+            for i in range(size * size):
+                key ^= table[i][cells >> (4 * i) & 15]
+        self.key = key
+        if pips is None:
+            pips = [0, 0]
+            for i in range(size * size):
+                v = cells >> (4 * i) & 15
+                pips[v >> 3] += v & PIP_MASK
+        self.blue_pips, self.red_pips = pips
+        self.movegen = None
+        self._rows = None
+
+    def copy(self):
+        new_state = PackedBoard(self.size, self.cells, self.blue, self.red, self.to_move, self.last_move,
+                                self.key, (self.blue_pips, self.red_pips))
+        if self.movegen is not None:
+            new_state.movegen = self.movegen.copy()
+        return new_state
+
+    def __hash__(self):
+        return self.key
+
+    def __eq__(self, other):
+        if isinstance(other, PackedBoard):
+            return (self.key == other.key and self.cells == other.cells
+                    and self.to_move == other.to_move)
+        if isinstance(other, Board):
+            return other == self
+        return NotImplemented
+
+    def get(self, r, c):
+        """Restituisce (player, pip) della cella (r, c) oppure None se vuota."""
+        i = r * self.size + c
+        if not (self.blue | self.red) >> i & 1:
+            return None
+        v = self.cells >> (4 * i)
+        return ("Red" if v & RED_BIT else "Blue", v & PIP_MASK)
+
+    # Vista a righe compatibile con Board.board, per le euristiche e la GUI.
+    @property
+    def board(self):
+        if self._rows is None:
+            self._rows = [[self.get(r, c) for c in range(self.size)] for r in range(self.size)]
+        return self._rows
+
+    def __getstate__(self):
+        # Come Board.__getstate__: il MoveGenerator non entra nei pickle.
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state["movegen"] = None
+        return None, state
+
+    @property
+    def empty(self):
+        return self.size * self.size - (self.blue | self.red).bit_count()
+
+    def is_full(self):
+        return (self.blue | self.red) == (1 << (self.size * self.size)) - 1
+
+    def count(self, player):
+        return (self.blue if player == "Blue" else self.red).bit_count()
+
+    def pip_count(self, player):
+        """Somma dei pip delle celle di player."""
+        return self.blue_pips if player == "Blue" else self.red_pips
+
+    def to_packed(self):
+        return self
+
+    def to_board(self):
+        return Board(self.size, [row[:] for row in self.board], self.to_move, self.last_move, self.key)
+
+    def to_frozen(self):
+        return FrozenBoard.make(self.size, self.cells.to_bytes((self.size * self.size + 1) // 2, "little"),
+                                self.to_move, self.key, nibbles=True)
+
+# Contenuto (player, pip) di ogni codice a 4 bit; None per la cella vuota. Le tuple sono condivise
+# da tutte le FrozenBoard, come le righe in _frozen_rows (chiave: i byte della riga).
+CODE_CELLS = [None] * 16
+for _cell, _code in PIECE_CODES.items():
+    CODE_CELLS[_code] = _cell
+_frozen_rows = {}
+
+class FrozenBoard:
+    """Board immutabile e condivisa, pensata per gli alberi di ricerca che conservano
+    moltissime posizioni (ad esempio i nodi di monte_carlo_tree_search).
+    Il contenuto è un bytes `cells` con il codice a 4 bit di ogni cella (PIECE_CODES, come in PackedBoard)
+    in ordine di riga. FrozenBoard.make restituisce sempre lo stesso oggetto per la stessa
+    coppia (cells, to_move) finché è in uso, quindi posizioni uguali non occupano memoria due volte.
+    Non conserva last_move (vale sempre None): una posizione condivisa può essere raggiunta con mosse
+    diverse. copy restituisce la board stessa; make_move e attach_movegen non sono ammessi."""
+    __slots__ = ("size", "cells", "to_move", "key", "empty", "blue_count", "red_count",
+                 "blue_pips", "red_pips", "_rows", "__weakref__")
+    _interned = {"Blue": weakref.WeakValueDictionary(), "Red": weakref.WeakValueDictionary()}
+    last_move = None
+    movegen = None
+
+    @classmethod
+    def make(cls, size, cells, to_move, key=None, counters=None, nibbles=False):
+        """Restituisce la board (condivisa) con celle `cells` e giocatore di turno to_move.
+        key e counters = (empty, blue_count, red_count, blue_pips, red_pips) si calcolano se mancano;
+        con nibbles=True `cells` contiene due celle per byte come PackedBoard.cells."""
+        if nibbles:
+            cells = bytes(b >> shift & 15 for b in cells for shift in (0, 4))[:size * size]
+        interned = cls._interned[to_move]
+        board = interned.get(cells)
+        if board is not None:
+            return board
+        board = object.__new__(cls)
+        if key is None:
+            table, red_to_move = zobrist_table(size)
+            key = red_to_move if to_move == "Red" else 0
+            for i, code in enumerate(cells):
+                key ^= table[i][code]
+        if counters is None:
+            counters = [cells.count(0), 0, 0, 0, 0]
+            for code in cells:
+                if code:
+                    counters[1 + (code >> 3)] += 1
+                    counters[3 + (code >> 3)] += code & PIP_MASK
+        setattr_ = object.__setattr__
+        setattr_(board, "size", size)
+        setattr_(board, "cells", cells)
+        setattr_(board, "to_move", to_move)
+        setattr_(board, "key", key)
+        for name, value in zip(("empty", "blue_count", "red_count", "blue_pips", "red_pips"), counters):
+            setattr_(board, name, value)
+        setattr_(board, "_rows", None)
+        interned[cells] = board
+        return board
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenBoard è immutabile")
+
+    def __reduce__(self):
+        return FrozenBoard.make, (self.size, self.cells, self.to_move, self.key)
+
+    def copy(self):
+        return self
+
+    def __hash__(self):
+        return self.key
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenBoard):
+            return self is other or (self.cells == other.cells and self.to_move == other.to_move)
+        if isinstance(other, (Board, PackedBoard)):
+            return self.key == other.key and self.to_move == other.to_move and self == other.to_frozen()
+        return NotImplemented
+
+    def get(self, r, c):
+        """Restituisce (player, pip) della cella (r, c) oppure None se vuota."""
+        return CODE_CELLS[self.cells[r * self.size + c]]
+
+    # Vista a righe (tuple in sola lettura) compatibile con Board.board, per le euristiche e la GUI.
+    @property
+    def board(self):
+        if self._rows is None:
+            rows = []
+            for r in range(0, self.size * self.size, self.size):
+                data = self.cells[r:r + self.size]
+                row = _frozen_rows.get(data)
+                if row is None:
+                    row = _frozen_rows[data] = tuple(CODE_CELLS[code] for code in data)
+                rows.append(row)
+            object.__setattr__(self, "_rows", tuple(rows))
+        return self._rows
+
+    def is_full(self):
+        return self.empty == 0
+
+    def count(self, player):
+        return self.blue_count if player == "Blue" else self.red_count
+
+    def pip_count(self, player):
+        """Somma dei pip delle celle di player."""
+        return self.blue_pips if player == "Blue" else self.red_pips
+
+    def to_packed(self):
+        cells = blue = red = 0
+        for i, code in enumerate(self.cells):
+            if code:
+                cells |= code << (4 * i)
+                if code & RED_BIT:
+                    red |= 1 << i
+                else:
+                    blue |= 1 << i
+        return PackedBoard(self.size, cells, blue, red, self.to_move, None, self.key,
+                           (self.blue_pips, self.red_pips))
+
+    def to_board(self):
+        return Board(self.size, [list(row) for row in self.board], self.to_move, None, self.key)
+
+    def to_frozen(self):
+        return self
+
+class MoveGenerator:
+    """Mosse legali mantenute in modo incrementale: cell_moves[i] contiene le mosse che
+    piazzano nella cella i (vuota se occupata). Una mossa segna soltanto le celle indicate da
+    BoardTables.dirty_of nella maschera `pending`; alla richiesta delle mosse si ricalcolano
+    solo quelle celle, così i nodi foglia della ricerca non pagano nessun aggiornamento.
+    Le copie condividono la lista cell_moves finché una delle due non deve modificarla."""
+    __slots__ = ("tables", "cell_moves", "pending", "shared")
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.cell_moves = [()] * (tables.size * tables.size)
+        self.pending = tables.full
+        self.shared = False
+
+    def copy(self):
+        new = MoveGenerator.__new__(MoveGenerator)
+        new.tables = self.tables
+        new.cell_moves = self.cell_moves
+        new.pending = self.pending
+        new.shared = self.shared = True
+        return new
+
+    def update(self, last_move):
+        """Segna le celle interessate dalla mossa last_move = (cella_inserimento, celle_catturate)."""
+        self.pending |= self.tables.dirty_of(last_move)
+
+    def moves(self, state):
+        """Lista completa delle mosse legali di state, nello stesso ordine di CephalopodGame.actions."""
+        if self.pending:
+            self.refresh(state)
+        return [move for moves in self.cell_moves for move in moves]
+
+    def refresh(self, state):
+        tables = self.tables
+        cell_moves = self.cell_moves
+        pending = self.pending
+        self.pending = 0
+        if self.shared:
+            self.cell_moves = cell_moves = cell_moves[:]
+            self.shared = False
+        if isinstance(state, PackedBoard):
+            occupied = state.blue | state.red
+            while pending:
+                low = pending & -pending
+                pending ^= low
+                i = low.bit_length() - 1
+                cell_moves[i] = () if occupied & low else tables.packed_moves_for(i, state.cells)
+        else:
+            board = state.board
+            while pending:
+                low = pending & -pending
+                pending ^= low
+                i = low.bit_length() - 1
+                r, c = tables.coords[i]
+                if board[r][c] is not None:
+                    cell_moves[i] = ()
+                else:
+                    pips = tuple([0 if board[nr][nc] is None else board[nr][nc][1]
+                                  for nr, nc in tables.neighbour_coords[i]])
+                    cell_moves[i] = tables.moves_for(i, pips)
+
+# Record restituito da CephalopodGame.make_move: cella di inserimento, celle catturate con il loro
+# contenuto precedente ((r, c), (player, pip)), giocatore di turno e ultima mossa precedenti.
+Undo = namedtuple("Undo", "cell captured to_move last_move")
 
 # Funzione ausiliaria che genera tutti i sottoinsiemi (delle celle adiacenti) con dimensione minima min_size.
 def get_subsets(adjacent, min_size=2):
@@ -74,6 +651,24 @@ def get_subsets(adjacent, min_size=2):
             subsets.append(list(comb))
     return subsets
 
+# Tabella delle catture: per ogni sequenza di pip di al più 4 celle adiacenti (0 = cella vuota)
+# contiene le catture legali come coppie (maschera delle posizioni catturate, somma dei pip),
+# nello stesso ordine in cui get_subsets enumera i sottoinsiemi delle celle occupate.
+def capture_table():
+    table = {}
+    for n in range(5):
+        for pips in itertools.product(range(7), repeat=n):
+            adjacent = [(k, pip) for k, pip in enumerate(pips) if pip]
+            captures = []
+            for subset in get_subsets(adjacent, 2):
+                s = sum(pip for k, pip in subset)
+                if 2 <= s <= 6:
+                    captures.append((sum(1 << k for k, pip in subset), s))
+            table[pips] = tuple(captures)
+    return table
+
+CAPTURES = capture_table()
+
 # Classe che definisce le regole del gioco Cephalopod.
 class CephalopodGame(Game):
     """Il gioco Cephalopod è un gioco a turni per due giocatori, Blue e Red.
@@ -81,51 +676,330 @@ class CephalopodGame(Game):
     Se la cella è adiacente a celle occupate da entrambi i giocatori, il giocatore può catturare le celle adiacenti
     e rimuoverle dalla board. Il gioco termina quando la board è piena o non ci sono più mosse legali.
     Il giocatore che occupa la maggioranza delle celle vince."""
-    def __init__(self, size=5, first_player="Blue"):
+    def __init__(self, size=5, first_player="Blue", packed=False, frozen=False):
         self.size = size
         self.first_player = first_player
         self.initial = Board(size, to_move=first_player)
+        self.tables = BoardTables.get(size)
+        self.zobrist = zobrist_table(size)
+        if packed:
+            self.initial = self.initial.to_packed()
+        elif frozen:
+            self.initial = self.initial.to_frozen()
     
+    # Collega alla board un MoveGenerator: da quel momento actions non scandisce più la board
+    # e result, make_move e unmake_move aggiornano solo le celle toccate dalla mossa.
+    # Le board derivate con result o copy ereditano il generatore.
+    def attach_movegen(self, state):
+        if isinstance(state, FrozenBoard):
+            raise TypeError("FrozenBoard è immutabile: non può avere un MoveGenerator")
+        state.movegen = MoveGenerator(self.tables)
+        return state
+
+    # Simmetrie della board: le 8 rotazioni e riflessioni (vedi BoardTables.symmetries) lasciano
+    # invariato il valore di una posizione. canonical sceglie tra gli 8 orientamenti quello con
+    # l'intero `cells` di PackedBoard più piccolo, così posizioni simmetriche condividono la stessa
+    # board (e chiave) canonica; transform_move e untransform_move traducono le mosse tra i due
+    # orientamenti.
+    def transform(self, state, t):
+        """Restituisce la board ottenuta applicando la simmetria t, nella stessa rappresentazione di state."""
+        tables = self.tables
+        last_move = state.last_move
+        if last_move is not None:
+            cell = tables.coords[tables.symmetries[t][last_move[0][0] * state.size + last_move[0][1]]]
+            last_move = (cell, tables.transform_positions(cell, last_move[1], t))
+        if isinstance(state, PackedBoard):
+            return PackedBoard(state.size, tables.transform_cells(state.cells, t),
+                               tables.transform_mask(state.blue, t), tables.transform_mask(state.red, t),
+                               state.to_move, last_move, None, (state.blue_pips, state.red_pips))
+        if isinstance(state, FrozenBoard):
+            cells = bytearray(len(state.cells))
+            for i, j in enumerate(tables.symmetries[t]):
+                cells[j] = state.cells[i]
+            return FrozenBoard.make(state.size, bytes(cells), state.to_move,
+                                    counters=(state.empty, state.blue_count, state.red_count,
+                                              state.blue_pips, state.red_pips))
+        cells = [None] * (state.size * state.size)
+        for i, j in enumerate(tables.symmetries[t]):
+            cells[j] = state.board[i // state.size][i % state.size]
+        rows = [cells[r * state.size:(r + 1) * state.size] for r in range(state.size)]
+        return Board(state.size, rows, state.to_move, last_move)
+
+    def canonical(self, state):
+        """Restituisce (board canonica, t) con transform(state, t) == board canonica."""
+        t = self.tables.canonical_cells(state.to_packed().cells)[0]
+        return (state if t == 0 else self.transform(state, t)), t
+
+    def canonical_key(self, state):
+        """Restituisce (chiave di Zobrist della board canonica, t) senza costruire la board."""
+        t, key = self.tables.canonical_cells(state.to_packed().cells)
+        return (key ^ self.zobrist[1] if state.to_move == "Red" else key), t
+
+    def transform_move(self, move, t):
+        """Traduce una mossa di state nella mossa corrispondente di transform(state, t)."""
+        tables = self.tables
+        (r, c), pip, captured = move
+        cell = tables.coords[tables.symmetries[t][r * self.size + c]]
+        return (cell, pip, tables.transform_positions(cell, captured, t))
+
+    def untransform_move(self, move, t):
+        """Inverso di transform_move: riporta una mossa della board trasformata con t su quella originale."""
+        return self.transform_move(move, self.tables.inverse_symmetry[t])
+
     # Restituisce l’insieme delle mosse legali.
     # Una mossa è una tupla: ((r,c), pip, captured)
     def actions(self, state):
+        if state.movegen is not None:
+            return state.movegen.moves(state)
+        if isinstance(state, PackedBoard):
+            return self._packed_actions(state)
+        if isinstance(state, FrozenBoard):
+            return [move for moves in self._moves_by_cell(state) for move in moves]
+        tables = self.tables
+        cells = [cell for row in state.board for cell in row]
         moves = []
-        for r in range(state.size):
-            for c in range(state.size):
-                if state.board[r][c] is None:  # cella vuota
-                    adjacent = []
-                    for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-                        nr, nc = r+dr, c+dc
-                        if 0 <= nr < state.size and 0 <= nc < state.size:
-                            if state.board[nr][nc] is not None:
-                                adjacent.append(((nr, nc), state.board[nr][nc][1]))
-                    capture_moves = []
-                    if len(adjacent) >= 2:
-                        subsets = get_subsets(adjacent, 2)
-                        for subset in subsets:
-                            s = sum(pip for pos, pip in subset)
-                            if 2 <= s <= 6:
-                                positions = tuple(pos for pos, pip in subset)
-                                capture_moves.append( ((r,c), s, positions) )
-                    if capture_moves:
-                        moves.extend(capture_moves)
-                    else:
-                        moves.append( ((r,c), 1, ()) )
+        for i, cell in enumerate(cells):
+            if cell is None:  # cella vuota
+                pips = tuple([0 if cells[j] is None else cells[j][1] for j in tables.neighbours[i]])
+                moves.extend(tables.moves_for(i, pips))
         return moves
 
+    def _packed_actions(self, state):
+        tables = self.tables
+        cells = state.cells
+        free = tables.full & ~(state.blue | state.red)
+        moves = []
+        while free:
+            low = free & -free
+            free ^= low
+            moves.extend(tables.packed_moves_for(low.bit_length() - 1, cells))
+        return moves
+
+    # Genera le mosse legali una alla volta, così chi le consuma (ad esempio alpha-beta dopo un taglio)
+    # può fermarsi senza generare le restanti.
+    # order=None: stesso ordine di actions, cella per cella.
+    # order="captures": prima le catture più grandi (più celle catturate), a parità quelle che catturano
+    # più celle dell'avversario, infine i piazzamenti senza cattura. Per ordinarle, le catture si
+    # generano tutte prima della prima mossa; i piazzamenti senza cattura restano pigri: una seconda
+    # scansione delle celle li genera solo se chi consuma le mosse arriva fin lì.
+    def iter_actions(self, state, order=None):
+        if order is None:
+            for moves in self._moves_by_cell(state):
+                yield from moves
+            return
+        if order != "captures":
+            raise ValueError("order deve essere None o 'captures'")
+        # In una cella le mosse sono tutte catture oppure un solo piazzamento senza cattura.
+        captures = [move for moves in self._moves_by_cell(state) if moves[0][2] for move in moves]
+        board = state.board
+        player = state.to_move
+        captures.sort(key=lambda move: (len(move[2]), sum(board[r][c][0] != player for r, c in move[2])),
+                      reverse=True)
+        yield from captures
+        for moves in self._moves_by_cell(state):
+            if not moves[0][2]:
+                yield moves[0]
+
+    # Genera, per ogni cella vuota, la tupla delle mosse che piazzano in quella cella.
+    def _moves_by_cell(self, state):
+        tables = self.tables
+        if state.movegen is not None:
+            movegen = state.movegen
+            if movegen.pending:
+                movegen.refresh(state)
+            # Con make_move i nodi figli aggiornano lo stesso generatore mentre questo è sospeso:
+            # marcandolo condiviso, le modifiche avvengono su una copia della lista.
+            movegen.shared = True
+            for moves in movegen.cell_moves:
+                if moves:
+                    yield moves
+        elif isinstance(state, PackedBoard):
+            cells = state.cells
+            free = tables.full & ~(state.blue | state.red)
+            while free:
+                low = free & -free
+                free ^= low
+                yield tables.packed_moves_for(low.bit_length() - 1, cells)
+        elif isinstance(state, FrozenBoard):
+            cells = state.cells
+            for i, code in enumerate(cells):
+                if not code:
+                    yield tables.moves_for(i, tuple([cells[j] & PIP_MASK for j in tables.neighbours[i]]))
+        else:
+            cells = [cell for row in state.board for cell in row]
+            for i, cell in enumerate(cells):
+                if cell is None:
+                    yield tables.moves_for(i, tuple([0 if cells[j] is None else cells[j][1]
+                                                     for j in tables.neighbours[i]]))
+
     # Restituisce la nuova board ottenuta applicando una mossa.
     def result(self, state, move):
+        if isinstance(state, PackedBoard):
+            return self._packed_result(state, move)
+        if isinstance(state, FrozenBoard):
+            return self._frozen_result(state, move)
         new_state = state.copy()
         (r, c), pip, captured = move
         current_player = state.to_move
+        table, red_to_move = self.zobrist
+        key = state.key ^ red_to_move ^ table[r * state.size + c][PIECE_CODES[(current_player, pip)]]
         new_state.board[r][c] = (current_player, pip)
+        pieces, pips = new_state.pieces, new_state.pips
+        pieces[current_player] += 1
+        pips[current_player] += pip
         for pos in captured:
             rr, cc = pos
+            cell = new_state.board[rr][cc]
+            key ^= table[rr * state.size + cc][PIECE_CODES[cell]]
+            pieces[cell[0]] -= 1
+            pips[cell[0]] -= cell[1]
             new_state.board[rr][cc] = None
+        new_state.key = key
+        new_state.empty += len(captured) - 1
         new_state.last_move = ((r, c), captured)
         new_state.to_move = "Red" if current_player == "Blue" else "Blue"
+        if new_state.movegen is not None:
+            new_state.movegen.update(new_state.last_move)
         return new_state
 
+    def _packed_result(self, state, move):
+        masks = self.tables.move_masks.get(move) or self.tables.masks_of(move)
+        bit, blue_nibble, red_nibble, keep_cells, keep_bits, i, captured = masks
+        table, red_to_move = self.zobrist
+        cells = state.cells
+        key = state.key ^ red_to_move
+        pips = [state.blue_pips, state.red_pips]
+        for j in captured:
+            v = cells >> (4 * j) & 15
+            key ^= table[j][v]
+            pips[v >> 3] -= v & PIP_MASK
+        cells &= keep_cells
+        if state.to_move == "Blue":
+            pips[0] += move[1]
+            new_state = PackedBoard(state.size, cells | blue_nibble, (state.blue & keep_bits) | bit,
+                                    state.red & keep_bits, "Red", (move[0], move[2]),
+                                    key ^ table[i][move[1]], pips)
+        else:
+            pips[1] += move[1]
+            new_state = PackedBoard(state.size, cells | red_nibble, state.blue & keep_bits,
+                                    (state.red & keep_bits) | bit, "Blue", (move[0], move[2]),
+                                    key ^ table[i][move[1] | RED_BIT], pips)
+        if state.movegen is not None:
+            new_state.movegen = state.movegen.copy()
+            new_state.movegen.update(new_state.last_move)
+        return new_state
+
+    def _frozen_result(self, state, move):
+        (r, c), pip, captured = move
+        size = state.size
+        table, red_to_move = self.zobrist
+        cells = bytearray(state.cells)
+        counters = [state.empty + len(captured) - 1, state.blue_count, state.red_count,
+                    state.blue_pips, state.red_pips]
+        i = r * size + c
+        code = PIECE_CODES[(state.to_move, pip)]
+        key = state.key ^ red_to_move ^ table[i][code]
+        cells[i] = code
+        counters[1 + (code >> 3)] += 1
+        counters[3 + (code >> 3)] += pip
+        for rr, cc in captured:
+            j = rr * size + cc
+            code = cells[j]
+            key ^= table[j][code]
+            counters[1 + (code >> 3)] -= 1
+            counters[3 + (code >> 3)] -= code & PIP_MASK
+            cells[j] = 0
+        return FrozenBoard.make(size, bytes(cells), "Red" if state.to_move == "Blue" else "Blue", key, counters)
+
+    # Applica la mossa modificando la board stessa, senza allocarne una nuova.
+    # Restituisce il record Undo da passare a unmake_move per tornare allo stato precedente.
+    # Non si applica a FrozenBoard, che è immutabile (usare result).
+    def make_move(self, state, move):
+        if isinstance(state, FrozenBoard):
+            raise TypeError("FrozenBoard è immutabile: usare result invece di make_move")
+        (r, c), pip, captured = move
+        undo = Undo((r, c), tuple((pos, state.get(*pos)) for pos in captured), state.to_move, state.last_move)
+        state.key ^= self._undo_key(state.size, undo, pip)
+        self._update_counters(state, undo, pip, 1)
+        if isinstance(state, PackedBoard):
+            masks = self.tables.move_masks.get(move) or self.tables.masks_of(move)
+            bit, blue_nibble, red_nibble, keep_cells, keep_bits, _, _ = masks
+            state.cells &= keep_cells
+            state.blue &= keep_bits
+            state.red &= keep_bits
+            if state.to_move == "Blue":
+                state.cells |= blue_nibble
+                state.blue |= bit
+            else:
+                state.cells |= red_nibble
+                state.red |= bit
+            state._rows = None
+        else:
+            state.board[r][c] = (state.to_move, pip)
+            for rr, cc in captured:
+                state.board[rr][cc] = None
+        state.last_move = ((r, c), captured)
+        state.to_move = "Red" if state.to_move == "Blue" else "Blue"
+        if state.movegen is not None:
+            state.movegen.update(state.last_move)
+        return undo
+
+    # Annulla una mossa applicata con make_move.
+    def unmake_move(self, state, undo):
+        (r, c), captured, to_move, last_move = undo
+        pip = state.get(r, c)[1]
+        state.key ^= self._undo_key(state.size, undo, pip)
+        self._update_counters(state, undo, pip, -1)
+        if isinstance(state, PackedBoard):
+            i = r * state.size + c
+            state.cells &= ~(15 << (4 * i))
+            state.blue &= ~(1 << i)
+            state.red &= ~(1 << i)
+            for (rr, cc), (player, pip) in captured:
+                j = rr * state.size + cc
+                if player == "Blue":
+                    state.cells |= pip << (4 * j)
+                    state.blue |= 1 << j
+                else:
+                    state.cells |= (pip | RED_BIT) << (4 * j)
+                    state.red |= 1 << j
+            state._rows = None
+        else:
+            state.board[r][c] = None
+            for (rr, cc), cell in captured:
+                state.board[rr][cc] = cell
+        if state.movegen is not None:
+            state.movegen.update(state.last_move)  # la mossa che si sta annullando
+        state.to_move = to_move
+        state.last_move = last_move
+
+    # Differenza (xor) tra le chiavi di Zobrist prima e dopo la mossa descritta da undo.
+    def _undo_key(self, size, undo, pip):
+        table, red_to_move = self.zobrist
+        (r, c), captured, to_move, _ = undo
+        key = red_to_move ^ table[r * size + c][PIECE_CODES[(to_move, pip)]]
+        for (rr, cc), cell in captured:
+            key ^= table[rr * size + cc][PIECE_CODES[cell]]
+        return key
+
+    # Aggiorna i contatori di pip (e per Board di celle) per la mossa descritta da undo,
+    # che piazza pip; sign = -1 quando la mossa viene annullata.
+    def _update_counters(self, state, undo, pip, sign):
+        if isinstance(state, PackedBoard):
+            delta = {"Blue": 0, "Red": 0}
+            delta[undo.to_move] += sign * pip
+            for _, (player, old_pip) in undo.captured:
+                delta[player] -= sign * old_pip
+            state.blue_pips += delta["Blue"]
+            state.red_pips += delta["Red"]
+            return
+        state.empty -= sign * (1 - len(undo.captured))
+        state.pieces[undo.to_move] += sign
+        state.pips[undo.to_move] += sign * pip
+        for _, (player, old_pip) in undo.captured:
+            state.pieces[player] -= sign
+            state.pips[player] -= sign * old_pip
+
     # Stato terminale se la board è completamente piena.
     def is_terminal(self, state):
         return state.is_full()
@@ -0,0 +1,142 @@
+"""Monte Carlo Tree Search con l'albero memorizzato in array NumPy (struct of arrays).
+
+MCT_Node (utils4e) usa un oggetto per nodo, con un dizionario di figli e una Board completa, e ucb
+fa un calcolo NumPy scalare per ogni figlio. ArrayTree tiene invece i nodi in array paralleli,
+indicizzati dal numero del nodo:
+    visits, wins    visite e vittorie (per il giocatore che ha mosso verso il nodo, come MCT_Node.U)
+    parent          indice del padre (-1 per la radice)
+    first_child     indice del primo figlio (-1 se il nodo non è ancora stato espanso)
+    n_children      numero di figli, che occupano gli indici first_child .. first_child + n_children - 1
+    move            la mossa che porta al nodo, codificata con BoardTables.move_code
+Un nodo occupa 32 byte. Le posizioni non si memorizzano: a ogni playout si copia la PackedBoard
+della radice e si applicano sul posto (game.make_move) le mosse del cammino scelto; il playout
+casuale che segue è quello di playoutKernel.
+La scelta del figlio calcola UCB in una sola operazione NumPy sui figli, contigui in memoria.
+"""
+
+import math
+import time
+
+import numpy as np
+
+import playoutKernel
+
+UCB_C = 1.4               # costante di esplorazione, come utils4e.ucb
+CLOCK_EVERY = 8           # playout tra due letture dell'orologio
+
+
+class ArrayTree:
+    """Albero MCTS di una posizione; search lo fa crescere e restituisce la mossa più visitata.
+    Lo stesso albero può essere fatto crescere da più chiamate a search."""
+
+    def __init__(self, game, state, capacity=1 << 12):
+        self.game = game
+        self.tables = game.tables
+        self.state = state.to_packed().copy()
+        self.state.movegen = None
+        self.visits = np.zeros(capacity)
+        self.wins = np.zeros(capacity)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int32)
+        self.move = np.zeros(capacity, dtype=np.int32)
+        self.size = 1  # il nodo 0 è la radice
+
+    def __len__(self):
+        return self.size
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.visits, self.wins, self.parent, self.first_child,
+                                      self.n_children, self.move))
+
+    def _grow(self, needed):
+        capacity = len(self.visits)
+        while capacity < needed:
+            capacity *= 2
+        for name, fill in (("visits", 0), ("wins", 0), ("parent", -1), ("first_child", -1),
+                           ("n_children", 0), ("move", 0)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _expand(self, node, board):
+        moves = self.game.actions(board)
+        k = len(moves)
+        first = self.size
+        if first + k > len(self.visits):
+            self._grow(first + k)
+        self.parent[first:first + k] = node
+        self.move[first:first + k] = [self.tables.move_code(m) for m in moves]
+        self.first_child[node] = first
+        self.n_children[node] = k
+        self.size = first + k
+
+    def _select_child(self, node):
+        first = self.first_child[node]
+        k = self.n_children[node]
+        n = self.visits[first:first + k]
+        unvisited = np.flatnonzero(n == 0)
+        if unvisited.size:
+            return first + unvisited[0]
+        ucb = self.wins[first:first + k] / n + UCB_C * np.sqrt(math.log(self.visits[node]) / n)
+        return first + int(np.argmax(ucb))
+
+    def _simulate(self, board):
+        """Playout casuale da board (playoutKernel.random_playout, che non la modifica);
+        restituisce 1 se vince chi ha fatto l'ultima mossa verso board, -1 altrimenti."""
+        return -1 if playoutKernel.random_playout(self.game, board) == board.to_move else 1
+
+    def _backprop(self, node, result):
+        while node >= 0:
+            if result > 0:
+                self.wins[node] += result
+            self.visits[node] += 1
+            result = -result
+            node = self.parent[node]
+
+    def playout(self):
+        game = self.game
+        board = self.state.copy()
+        node = 0
+        while self.first_child[node] >= 0:
+            node = self._select_child(node)
+            game.make_move(board, self.tables.code_move(int(self.move[node])))
+        if not game.is_terminal(board):
+            self._expand(node, board)
+            node = self._select_child(node)
+            game.make_move(board, self.tables.code_move(int(self.move[node])))
+        self._backprop(node, self._simulate(board))
+
+    def best_move(self):
+        """Mossa del figlio della radice con più visite (None se la radice non è espansa)."""
+        first, k = self.first_child[0], self.n_children[0]
+        if first < 0:
+            return None
+        return self.tables.code_move(int(self.move[first + int(np.argmax(self.visits[first:first + k]))]))
+
+    def search(self, N=1000, deadline=None, stop=None, stats=None):
+        """Fa N playout (None: senza limite) o si ferma alla scadenza deadline (un istante di
+        time.perf_counter(), letto ogni CLOCK_EVERY playout) o quando stop (un threading.Event)
+        viene impostato; restituisce la mossa più visitata. Con stats (una SearchStats) conta
+        i nodi creati (nodes) e i playout (leaves)."""
+        if N is None and deadline is None and stop is None:
+            raise ValueError("serve N, deadline oppure stop")
+        playouts = 0
+        size = self.size
+        while N is None or playouts < N:
+            if stop is not None and stop.is_set():
+                break
+            self.playout()
+            playouts += 1
+            if deadline is not None and playouts % CLOCK_EVERY == 0 and time.perf_counter() > deadline:
+                break
+        if stats is not None:
+            stats.nodes += self.size - size
+            stats.leaves += playouts
+        return self.best_move()
+
+
+def array_mcts_search(state, game, N=1000, deadline=None, stop=None, stats=None):
+    """Come playingStrategies.monte_carlo_tree_search, con un ArrayTree nuovo."""
+    return ArrayTree(game, state).search(N, deadline, stop, stats)
@@ -0,0 +1,243 @@
+"""Valutazione di molte posizioni con una sola chiamata NumPy.
+
+BoardBatch memorizza N board come array: `owner` (N, size*size) con 1 per Blue, -1 per Red
+e 0 per le celle vuote, `pip` (N, size*size) con i pip (0 se vuota) e `to_move` (N,) con
+1 se deve muovere Blue e -1 se deve muovere Red. Le celle sono in ordine di riga.
+
+Le funzioni h_* sono le versioni vettoriali delle euristiche esistenti e restituiscono un
+array di N punteggi, uguali a quelli della versione scalare sulla stessa board, con gli stessi
+pesi (le costanti W_* dei moduli delle versioni scalari):
+    h_playing_strategies  ->  playingStrategies.h
+    h_alpha_flat          ->  playerExampleAlphaFlat.h
+    h_gallo_mari          ->  playingStrategies_Gallo_Mari.h
+"""
+
+import itertools
+
+import numpy as np
+
+import playerExampleAlphaFlat
+import playingStrategies
+import playingStrategies_Gallo_Mari
+
+RED_BIT = 8
+PIP_MASK = 7
+
+
+class BoardBatch:
+    """N posizioni della stessa dimensione memorizzate come piani NumPy."""
+
+    def __init__(self, size, owner, pip, to_move):
+        self.size = size
+        self.owner = owner
+        self.pip = pip
+        self.to_move = to_move
+
+    def __len__(self):
+        return len(self.to_move)
+
+    @classmethod
+    def from_boards(cls, boards):
+        """Costruisce il batch da una sequenza di Board o PackedBoard."""
+        boards = list(boards)
+        size = boards[0].size
+        n_cells = size * size
+        n_bytes = (n_cells + 1) // 2
+        packed = bytearray()
+        for board in boards:
+            # Stessa codifica a 4 bit per cella di PackedBoard: basta una sola frombuffer.
+            packed += board.to_packed().cells.to_bytes(n_bytes, "little")
+        raw = np.frombuffer(bytes(packed), dtype=np.uint8).reshape(len(boards), n_bytes)
+        codes = np.empty((len(boards), 2 * n_bytes), dtype=np.uint8)
+        codes[:, 0::2] = raw & 15
+        codes[:, 1::2] = raw >> 4
+        codes = codes[:, :n_cells]
+        pip = (codes & PIP_MASK).astype(np.int8)
+        owner = np.where(codes == 0, 0, np.where(codes & RED_BIT, -1, 1)).astype(np.int8)
+        to_move = np.array([1 if board.to_move == "Blue" else -1 for board in boards], dtype=np.int8)
+        return cls(size, owner, pip, to_move)
+
+    def to_boards(self, game):
+        """Ricostruisce le board come oggetti Board della stessa classe di game.initial."""
+        board_class = type(game.initial.to_board())
+        boards = []
+        for owner, pip, to_move in zip(self.owner.tolist(), self.pip.tolist(), self.to_move.tolist()):
+            cells = [None if o == 0 else ("Blue" if o == 1 else "Red", p) for o, p in zip(owner, pip)]
+            rows = [cells[r * self.size:(r + 1) * self.size] for r in range(self.size)]
+            boards.append(board_class(self.size, rows, "Blue" if to_move == 1 else "Red"))
+        return boards
+
+    def player_sign(self, player=None):
+        """Segno (N, 1) del giocatore dal cui punto di vista si valuta: player è "Blue", "Red"
+        oppure None per usare il giocatore di turno di ogni posizione."""
+        if player is None:
+            return self.to_move.astype(np.int32)[:, None]
+        return np.full((len(self), 1), 1 if player == "Blue" else -1, dtype=np.int32)
+
+
+class _Geometry:
+    """Tabelle per dimensione: matrice di adiacenza, grado e indici degli adiacenti di ogni
+    cella (riempiti con l'indice size*size, una cella virtuale sempre vuota)."""
+    _by_size = {}
+
+    def __init__(self, size):
+        n_cells = size * size
+        self.adjacency = np.zeros((n_cells, n_cells), dtype=np.int32)
+        self.neighbours = np.full((n_cells, 4), n_cells, dtype=np.intp)
+        for r in range(size):
+            for c in range(size):
+                i = r * size + c
+                k = 0
+                for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                    if 0 <= r + dr < size and 0 <= c + dc < size:
+                        j = (r + dr) * size + (c + dc)
+                        self.adjacency[i, j] = 1
+                        self.neighbours[i, k] = j
+                        k += 1
+        self.degree = self.adjacency.sum(axis=1)
+        rows, cols = np.divmod(np.arange(n_cells), size)
+        center = size // 2
+        self.dist_center = np.abs(rows - center) + np.abs(cols - center)
+        on_row_edge = (rows == 0) | (rows == size - 1)
+        on_col_edge = (cols == 0) | (cols == size - 1)
+        self.corner = on_row_edge & on_col_edge
+        self.edge = (on_row_edge | on_col_edge) & ~self.corner
+        self.center = (rows == center) & (cols == center)
+        self.inner = ~(on_row_edge | on_col_edge) & ~self.center
+
+    @classmethod
+    def get(cls, size):
+        if size not in cls._by_size:
+            cls._by_size[size] = _Geometry(size)
+        return cls._by_size[size]
+
+    def gather(self, values):
+        """values (N, size*size) -> (N, size*size, 4) con i valori delle celle adiacenti (0 se assenti)."""
+        padded = np.concatenate([values, np.zeros((values.shape[0], 1), dtype=values.dtype)], axis=1)
+        return padded[:, self.neighbours]
+
+
+def _pattern_table(n_codes, value):
+    """Tabella indicizzata da sum(code_k * n_codes**k) sui 4 adiacenti di una cella,
+    con value(codici degli adiacenti occupati) calcolato per ogni combinazione."""
+    table = np.zeros(n_codes ** 4)
+    for codes in itertools.product(range(n_codes), repeat=4):
+        index = sum(code * n_codes ** k for k, code in enumerate(codes))
+        table[index] = value([code for code in codes if code])
+    return table
+
+
+def _capture_subsets(codes, pip_of):
+    for k in range(2, len(codes) + 1):
+        for subset in itertools.combinations(codes, k):
+            if sum(pip_of(code) for code in subset) <= 6:
+                yield subset
+
+
+_tables = {}
+
+
+def _table(name):
+    if name not in _tables:
+        if name == "mobility":
+            # Numero di mosse legali per cella vuota, dati i pip adiacenti (codice = pip).
+            def value(codes):
+                captures = sum(1 for subset in _capture_subsets(codes, lambda code: code)
+                               if sum(subset) >= 2)
+                return max(1, captures)
+            _tables[name] = _pattern_table(7, value)
+        elif name == "alpha_flat":
+            # Catture potenziali di playerExampleAlphaFlat.h: codice = pip per le celle del
+            # giocatore valutato e pip + 6 per quelle dell'avversario.
+            w = playerExampleAlphaFlat
+            def value(codes):
+                score = 0.0
+                for subset in _capture_subsets(codes, lambda code: (code - 1) % 6 + 1):
+                    has_enemy = any(code > 6 for code in subset)
+                    has_ally = any(code <= 6 for code in subset)
+                    if has_enemy:
+                        score += w.W_POTENZIALE_CATTURA + (w.W_CATTURA if not has_ally else 0)
+                    if has_ally:
+                        score -= w.W_POTENZIALE_CATTURA + (w.W_CATTURA if not has_enemy else 0)
+                return score
+            _tables[name] = _pattern_table(13, value)
+    return _tables[name]
+
+
+def _pattern_index(codes, n_codes):
+    return (codes * (n_codes ** np.arange(4))).sum(axis=2)
+
+
+def h_playing_strategies(batch, player=None):
+    """Versione vettoriale di playingStrategies.h."""
+    geo = _Geometry.get(batch.size)
+    sign = batch.player_sign(player)
+    rel = batch.owner.astype(np.int32) * sign          # 1 giocatore, -1 avversario, 0 vuota
+    pip = batch.pip.astype(np.int32)
+    occupied = (batch.owner != 0).astype(np.int32)
+    full = (occupied @ geo.adjacency) == geo.degree    # tutti gli adiacenti occupati
+    w = playingStrategies
+    position = w.W_CENTRO * geo.center + w.W_MEDIO * geo.inner + w.W_ANGOLO * geo.corner + w.W_BORDO * geo.edge
+    cell = position + w.W_VICINI_OCCUPATI * full
+    six = w.W_SEI * (pip == 6)
+    mine = rel == 1
+    theirs = rel == -1
+    score = w.W_TERRITORIO * (mine.sum(axis=1) - theirs.sum(axis=1))
+    score = (score + ((cell + w.W_SEI_PROPRIO * six) * mine).sum(axis=1)
+             - ((cell + w.W_SEI_AVVERSARIO * six) * theirs).sum(axis=1))
+    mid_pips = np.where((pip > 1) & (pip < 6), pip, 0)
+    return score + w.W_PIP_MEDI * (mid_pips * rel).sum(axis=1)
+
+
+def h_alpha_flat(batch, player=None):
+    """Versione vettoriale di playerExampleAlphaFlat.h."""
+    w = playerExampleAlphaFlat
+    geo = _Geometry.get(batch.size)
+    n = batch.size
+    sign = batch.player_sign(player)
+    owner = batch.owner.astype(np.int32)
+    rel = owner * sign
+    pip = batch.pip.astype(np.int32)
+    occupied = owner != 0
+    blue = (owner == 1).astype(np.int32)
+    red = (owner == -1).astype(np.int32)
+    empty_neighbours = geo.degree - occupied.astype(np.int32) @ geo.adjacency
+    same_owner = np.where(owner == 1, blue @ geo.adjacency, red @ geo.adjacency)
+    threat = np.where(owner == 1, (pip * red) @ geo.adjacency, (pip * blue) @ geo.adjacency)
+    vulnerable = occupied & (threat >= pip)
+
+    score = w.W_DADI * rel.sum(axis=1)
+    score = score + w.W_VAL_DADI * (rel * pip).sum(axis=1)
+    score = score + w.W_LIBERTA * (rel * empty_neighbours).sum(axis=1)
+    score = score + w.W_CENTRO * (rel * (n - geo.dist_center)).sum(axis=1)
+    score = score + w.W_ANGOLI * (rel * geo.corner).sum(axis=1)
+    score = score + w.W_SEI * (rel * (pip == 6)).sum(axis=1)
+    score = score - w.W_VULNERABILITA * (rel * vulnerable).sum(axis=1)
+    score = score + w.W_VICINI * (rel * same_owner).sum(axis=1)
+
+    codes = np.where(rel == 1, pip, 0) + np.where(rel == -1, pip + 6, 0)
+    captures = _table("alpha_flat")[_pattern_index(geo.gather(codes), 13)]
+    return score + (captures * ~occupied).sum(axis=1)
+
+
+def h_gallo_mari(batch, player=None):
+    """Versione vettoriale di playingStrategies_Gallo_Mari.h (senza le variabili globali
+    che la versione scalare aggiorna a ogni chiamata)."""
+    geo = _Geometry.get(batch.size)
+    sign = batch.player_sign(player)
+    rel = batch.owner.astype(np.int32) * sign
+    pip = batch.pip.astype(np.int32)
+    mine = (rel == 1).astype(np.int32)
+    theirs = (rel == -1).astype(np.int32)
+    center_bonus = np.maximum(0, 3 - geo.dist_center)
+    # Coppie di celle adiacenti (mia, avversaria) con il pip della cella minacciata <= 5.
+    opponent_threat = (mine * ((theirs * (pip <= 5)) @ geo.adjacency)).sum(axis=1)
+    player_threat = (theirs * ((mine * (pip <= 5)) @ geo.adjacency)).sum(axis=1)
+    mobility = (_table("mobility")[_pattern_index(geo.gather(pip), 7)] * (rel == 0)).sum(axis=1)
+    w = playingStrategies_Gallo_Mari
+    return (w.W_CELLE * rel.sum(axis=1) +
+            w.W_PIP * (rel * pip).sum(axis=1) +
+            w.W_CENTRO * (mine * center_bonus).sum(axis=1) +
+            w.W_MOBILITA * mobility -
+            w.W_MINACCE * player_threat +
+            w.W_MINACCE * opponent_threat)
@@ -0,0 +1,239 @@
+"""Libro delle aperture: le mosse delle prime posizioni della partita calcolate una volta per tutte.
+
+build_book esplora le posizioni dei primi `plies` turni a partire da game.initial, ciascuna ridotta
+alla sua forma canonica per le 8 simmetrie della board (CephalopodGame.canonical), e cerca ognuna
+con playingStrategies.negamax_search a profondità `depth`, distribuendo le posizioni su un pool di
+processi. Il risultato è un file binario ordinato per chiave, con un record di RECORD.size byte per
+posizione: (chiave di Zobrist canonica, impronta dell'euristica, valore, mossa, profondità).
+
+OpeningBook apre il file con mmap e cerca la chiave con una ricerca binaria: non legge né carica
+il file in memoria, quindi la risposta costa una canonical_key e una ventina di letture.
+
+Il libro si ricostruisce in modo incrementale: build_book riusa i record del file esistente che
+hanno la stessa impronta dell'euristica (heuristic_fingerprint) e una profondità almeno uguale,
+e cerca soltanto le posizioni nuove o calcolate con un'euristica diversa. Il file viene scritto
+alla fine in un file temporaneo e poi sostituito, così chi lo sta leggendo non vede mai un libro
+a metà.
+
+Uso offline:  python openingBook.py [plies] [depth]
+playerStrategy(game, state) segue il contratto dei giocatori della GUI.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+import playingStrategies
+from CephalopodGame import CephalopodGame
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openingBook.bin")
+PLIES = 3   # turni coperti dal libro costruito da riga di comando
+DEPTH = 5   # profondità della ricerca di ogni posizione
+
+MAGIC = b"CPHB"
+HEADER = struct.Struct("<4sBBxxI")    # magic, versione, dimensione della board, numero di record
+RECORD = struct.Struct("<QIfHBx")     # chiave, impronta, valore, mossa, profondità
+VERSION = 1
+
+
+def heuristic_fingerprint(h):
+    """Impronta a 32 bit di una funzione euristica: cambia quando cambia il suo codice, le sue
+    costanti, le costanti numeriche del modulo che legge o uno qualsiasi dei pesi W_* del suo
+    modulo, anche quelli usati solo dalle funzioni che chiama (non quando cambia il codice di
+    queste funzioni)."""
+    code = h.__code__
+    weights = sorted((name, value) for name, value in h.__globals__.items()
+                     if (name in code.co_names or name.startswith("W_"))
+                     and isinstance(value, (int, float)) and not isinstance(value, bool))
+    data = b"".join([h.__module__.encode(), h.__qualname__.encode(), code.co_code,
+                     repr(code.co_consts).encode(), repr(code.co_names).encode(), repr(weights).encode()])
+    return zlib.crc32(data)
+
+
+def book_positions(game, plies):
+    """Posizioni canoniche (PackedBoard) dei primi `plies` turni, senza ripetizioni e senza
+    posizioni terminali, in ordine di turno."""
+    start = game.canonical(game.initial.to_packed())[0]
+    frontier = {game.canonical_key(start)[0]: start}
+    positions = []
+    for ply in range(plies):
+        positions.extend(frontier.values())
+        following = {}
+        if ply + 1 < plies:
+            for state in frontier.values():
+                for move in game.actions(state):
+                    child = game.result(state, move)
+                    if game.is_terminal(child):
+                        continue
+                    key = game.canonical_key(child)[0]
+                    if key not in following:
+                        following[key] = game.canonical(child)[0]
+        frontier = following
+    return positions
+
+
+def read_records(path, size):
+    """Record del libro in path come lista di tuple RECORD; lista vuota se il file manca o è di
+    un'altra versione o dimensione."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        return []
+    magic, version, book_size, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or book_size != size:
+        return []
+    return list(RECORD.iter_unpack(data[HEADER.size:HEADER.size + count * RECORD.size]))
+
+
+def write_records(path, size, records):
+    records = sorted(records)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    os.replace(tmp, path)
+
+
+def _search_position(state):
+    """Restituisce (chiave, valore, mossa codificata) di una posizione canonica."""
+    worker = playingStrategies.worker
+    game = worker["game"]
+    value, move = playingStrategies.negamax_search(
+        game, state, worker["h"], playingStrategies.cutoff_depth(worker["depth"]),
+        tt=worker["tt"], ordering=worker["ordering"])
+    return state.key, value, game.tables.move_code(move)
+
+
+def build_book(game, path=BOOK_PATH, plies=PLIES, depth=DEPTH, h=None, workers=None, verbose=True):
+    """Costruisce (o aggiorna) il libro in path con le posizioni dei primi `plies` turni cercate
+    a profondità depth con l'euristica h (playingStrategies.h se None), su `workers` processi
+    (None: uno per core). h deve essere definita a livello di modulo, così i processi possono
+    riceverla. Restituisce il numero di posizioni cercate."""
+    fingerprint = heuristic_fingerprint(h if h is not None else playingStrategies.h)
+    size = game.initial.size
+    # I record ancora validi si tengono, quelli di posizioni non più nel libro restano anche loro:
+    # costano solo spazio e tornano utili se si torna a un numero di turni maggiore.
+    records = {record[0]: record for record in read_records(path, size)}
+    positions = book_positions(game, plies)
+    todo = [state for state in positions
+            if not (state.key in records and records[state.key][1] == fingerprint
+                    and records[state.key][4] >= depth)]
+    if verbose:
+        print("libro: %d posizioni, %d da cercare" % (len(positions), len(todo)))
+    start = time.perf_counter()
+    if todo:
+        with playingStrategies.worker_pool(workers, game, h, depth=depth) as pool:
+            done = pool.imap_unordered(_search_position, todo, chunksize=4)
+            for n, (key, value, code) in enumerate(done, 1):
+                records[key] = (key, fingerprint, value, code, depth)
+                if verbose and n % 100 == 0:
+                    print("  %d/%d  %.1f s" % (n, len(todo), time.perf_counter() - start))
+    write_records(path, size, records.values())
+    if verbose:
+        print("libro scritto in %s: %d posizioni, %.1f s" % (path, len(records), time.perf_counter() - start))
+    return len(todo)
+
+
+class OpeningBook:
+    """Libro aperto in lettura con mmap. move(game, state) restituisce la mossa del libro per
+    state (nella sua orientazione) oppure None; lookup(game, state) anche il valore. Valgono solo
+    i record con l'impronta dell'euristica del giocatore (fingerprint, di default quella di
+    playingStrategies.h): un libro costruito con un'altra euristica non risponde."""
+
+    def __init__(self, path=BOOK_PATH):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # file vuoto
+            self.file.close()
+            raise
+        magic, version, self.size, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("%s non è un libro delle aperture (versione %d)" % (path, VERSION))
+        self.keys = _Keys(self.data, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def record(self, key):
+        """Record RECORD della chiave canonica key, oppure None."""
+        i = bisect.bisect_left(self.keys, key)
+        if i < self.count and self.keys[i] == key:
+            return RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+        return None
+
+    def lookup(self, game, state, fingerprint=None):
+        """Restituisce (valore, mossa) del libro per il giocatore di turno in state, oppure None
+        se state non è nel libro o il suo record ha un'impronta diversa da fingerprint."""
+        if state.size != self.size:
+            return None
+        key, t = game.canonical_key(state)
+        record = self.record(key)
+        if fingerprint is None:
+            fingerprint = heuristic_fingerprint(playingStrategies.h)
+        if record is None or record[1] != fingerprint:
+            return None
+        return record[2], game.untransform_move(game.tables.code_move(record[3]), t)
+
+    def move(self, game, state, fingerprint=None):
+        found = self.lookup(game, state, fingerprint)
+        return found[1] if found is not None else None
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Keys:
+    """Vista in sola lettura sulle chiavi dei record, per bisect."""
+
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from("<Q", self.data, HEADER.size + i * RECORD.size)[0]
+
+
+_books = {}
+
+
+def book_move(game, state, path=BOOK_PATH):
+    """Mossa del libro in path per state, oppure None (anche se il libro non esiste)."""
+    if path not in _books:
+        _books[path] = OpeningBook(path) if os.path.exists(path) else None
+    book = _books[path]
+    return book.move(game, state) if book is not None else None
+
+
+def playerStrategy(game, state, time_limit=playingStrategies.TIME_LIMIT):
+    # Fuori dal libro si gioca con l'approfondimento iterativo di negamax.
+    move = book_move(game, state)
+    if move is None:
+        value, move = playingStrategies.iterative_negamax_search(
+            game, state, deadline=time.perf_counter() + time_limit,
+            ordering=playingStrategies.MoveOrdering())
+    return move
+
+
+if __name__ == "__main__":
+    plies = int(sys.argv[1]) if len(sys.argv) > 1 else PLIES
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else DEPTH
+    build_book(CephalopodGame(), plies=plies, depth=depth)
@@ -0,0 +1,107 @@
+"""Monte Carlo Tree Search parallela alla radice (root parallelization) su più processi.
+
+Il GIL impedisce ai thread di fare playout in parallelo: ParallelMCTS avvia invece K processi una
+sola volta per partita. A ogni mossa ciascun processo fa crescere un proprio albero dalla stessa
+radice con playingStrategies.monte_carlo_tree_search, con un seme diverso, fino alla scadenza;
+poi restituisce visite e vittorie dei figli della radice, che vengono sommate mossa per mossa:
+vince la mossa con più visite in totale.
+
+Ogni processo ha un canale (Pipe) dedicato e riceve a ogni mossa esattamente un compito, così
+resta sempre lo stesso processo a far crescere lo stesso albero: tra una mossa e l'altra ognuno
+riparte dal nipote con la posizione arrivata (playingStrategies.mcts_subtree), come
+playerExampleMCTS.
+
+playerStrategy(game, state) segue il contratto dei giocatori della GUI.
+"""
+
+import multiprocessing
+import random
+import time
+
+import playingStrategies
+from utils4e import MCT_Node
+
+WORKERS = None  # numero di processi di playerStrategy (None: uno per core)
+
+
+def _worker_loop(game, conn, seed):
+    """Ciclo di un processo: per ogni (state, secondi) ricevuto risponde con
+    (playout, {mossa: (visite, vittorie)}); None lo fa terminare."""
+    random.seed(seed)
+    root = None
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        state, seconds = task
+        deadline = time.perf_counter() + seconds
+        root = playingStrategies.mcts_subtree(root, state) or MCT_Node(state=state)
+        before = root.N
+        playingStrategies.monte_carlo_tree_search(state, game, None, root=root, deadline=deadline)
+        conn.send((root.N - before, {action: (child.N, child.U) for child, action in root.children.items()}))
+    conn.close()
+
+
+class ParallelMCTS:
+    """K processi di MCTS parallela alla radice; va creato una volta per partita e chiuso con
+    close (oppure usato con with). Dopo ogni search, playouts contiene i playout fatti da tutti
+    i processi per quella mossa."""
+
+    def __init__(self, game, workers=None, seed=None):
+        self.game = game
+        workers = workers or multiprocessing.cpu_count()
+        seed = random.randrange(1 << 30) if seed is None else seed
+        self.connections = []
+        self.processes = []
+        for k in range(workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker_loop, args=(game, child, seed + k), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.playouts = 0
+
+    def search(self, state, seconds):
+        """Restituisce la mossa con più visite sommando gli alberi di tutti i processi, ciascuno
+        cresciuto per `seconds` secondi a partire da state."""
+        for conn in self.connections:
+            conn.send((state, seconds))
+        visits = {}
+        self.playouts = 0
+        for conn in self.connections:
+            playouts, children = conn.recv()
+            self.playouts += playouts
+            for action, (n, u) in children.items():
+                total_n, total_u = visits.get(action, (0, 0))
+                visits[action] = (total_n + n, total_u + u)
+        if not visits:
+            return None
+        return max(visits, key=lambda action: visits[action])
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for process in self.processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def playerStrategy(game, state):
+    # Un gruppo di processi per partita, creato alla prima mossa e riusato per le successive.
+    searcher = playingStrategies.per_game(game, __name__, lambda game: ParallelMCTS(game, WORKERS))
+    # Un piccolo margine per spedire la posizione e sommare i risultati.
+    return searcher.search(state, playingStrategies.TIME_LIMIT - 0.1)
@@ -0,0 +1,97 @@
+"""Ricerca alpha-beta parallela su più processi, suddividendo le mosse della radice.
+
+Il GIL impedisce ai thread della GUI di cercare in parallelo: ParallelSearcher crea invece un pool
+di processi una sola volta per partita (i processi restano attivi tra una mossa e l'altra, con le
+loro tabelle di trasposizione) e a ogni mossa assegna a ciascun processo una mossa della radice,
+cercata con playingStrategies.negamax_search alla profondità richiesta.
+I processi condividono il miglior valore trovato finora (alpha della radice): chi inizia una nuova
+mossa la cerca con la finestra (alpha, +inf) e si ferma appena sa che non è migliore.
+
+Con deterministic=True ogni mossa della radice viene cercata con la finestra completa e con
+tabelle che rispondono solo a richieste della stessa profondità: il risultato è quello di
+negamax_search con TranspositionTable(exact_depth=True) e senza ordinamento alla radice, cioè
+lo stesso valore e la stessa mossa (la prima mossa migliore nell'ordine di game.actions)
+della ricerca seriale alla stessa profondità.
+
+playerStrategy(game, state) segue il contratto dei giocatori della GUI.
+"""
+
+import math
+import multiprocessing
+
+import playingStrategies
+
+infinity = math.inf
+
+DEPTH = 3       # profondità usata da playerStrategy
+WORKERS = None  # numero di processi di playerStrategy (None: uno per core)
+
+def _search_move(task):
+    """Valuta per il giocatore di turno in state la mossa move della radice (indice index);
+    restituisce (index, valore, esatto). Senza deterministic il valore è esatto solo se supera
+    l'alpha condiviso letto all'inizio, altrimenti è un limite superiore."""
+    index, state, move, depth, deterministic = task
+    worker = playingStrategies.worker
+    game = worker["game"]
+    best = worker["best"]
+    alpha = -infinity if deterministic else best.value
+    # Il figlio è alla profondità 1 della ricerca seriale: cutoff_depth(depth - 1) a partire da 0.
+    value, _ = playingStrategies.negamax_search(
+        game, game.result(state, move), worker["h"], playingStrategies.cutoff_depth(depth - 1),
+        alpha, +infinity, worker["exact_tt"] if deterministic else worker["tt"],
+        None if deterministic else worker["ordering"],
+        quiescence=worker["quiescence"], player=state.to_move)
+    exact = value > alpha
+    if not deterministic and exact:
+        with best.get_lock():
+            if value > best.value:
+                best.value = value
+    return index, value, exact
+
+
+class ParallelSearcher:
+    """Pool di processi per la ricerca parallela; va creato una volta per partita e chiuso con
+    close (oppure usato con with). h deve essere una funzione definita a livello di modulo,
+    così i processi possono riceverla; None usa playingStrategies.h."""
+
+    def __init__(self, game, workers=None, h=None, quiescence=0):
+        self.game = game
+        self.best = multiprocessing.Value("d", -infinity)
+        self.pool = playingStrategies.worker_pool(
+            workers, game, h, best=self.best, quiescence=quiescence,
+            exact_tt=playingStrategies.TranspositionTable(exact_depth=True))
+
+    def search(self, state, depth, deterministic=False):
+        """Restituisce (valore, mossa) per il giocatore di turno in state, cercando a profondità depth
+        (come cutoff_depth(depth) nella ricerca seriale)."""
+        if deterministic:
+            moves = self.game.actions(state)
+        else:
+            moves = list(self.game.iter_actions(state, "captures"))  # un buon alpha arriva prima
+        if not moves:
+            return None, None
+        with self.best.get_lock():
+            self.best.value = -infinity
+        tasks = [(i, state, move, depth, deterministic) for i, move in enumerate(moves)]
+        results = self.pool.imap_unordered(_search_move, tasks)
+        # Solo i valori esatti contano (gli altri sono limiti superiori, non migliori del massimo);
+        # a parità di valore vince la prima mossa nell'ordine, come nella ricerca seriale.
+        value, index = max((value, -index) for index, value, exact in results if exact)
+        return value, moves[-index]
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def playerStrategy(game, state):
+    # Un pool per partita, creato alla prima mossa e riusato per le successive.
+    searcher = playingStrategies.per_game(game, __name__, lambda game: ParallelSearcher(game, WORKERS))
+    value, move = searcher.search(state, DEPTH)
+    return move
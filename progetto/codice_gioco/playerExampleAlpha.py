@@ -1,72 +1,98 @@
-import math
+import math, time
+
+import playingStrategies
 
 infinity = math.inf
+QUIESCENCE = 2  # turni di sole catture cercati oltre la profondità nominale (0: nessuno)
 
-def playerStrategy (game,state):
+def playerStrategy (game,state, time_limit=playingStrategies.TIME_LIMIT):
+    # Approfondimento iterativo: la profondità non dipende più dalle celle occupate ma dal tempo.
+    value, move = iterative_deepening_search(game, state, time.perf_counter() + time_limit,
+                                             quiescence=QUIESCENCE)
+    return move
 
-    player = state.to_move
-    avversario = "Red" if player == "Blue" else "Blue"
-    occupate_player = state.count(player)
-    occupate_avversario = state.count(avversario)
-    occupate = occupate_player + occupate_avversario
-    if occupate <= 8:
-        cutOff = 3
-        value, move = h_alphabeta_search(game, state, cutoff_depth(cutOff))
-        return move
-    if occupate <= 18:
-        cutOff = 4
-        value, move = h_alphabeta_search(game, state, cutoff_depth(cutOff))
-        return move
-    if occupate <= 21:
-        cutOff = 5
-        value,move = h_alphabeta_search(game,state,cutoff_depth(cutOff))
-        return move
-    if occupate <= 22:
-        cutOff = 7
-        value, move = h_alphabeta_search(game, state, cutoff_depth(cutOff))
-        return move
-    if occupate <= 23:
-        cutOff = 8
-        value, move = h_alphabeta_search(game, state, cutoff_depth(cutOff))
-        return move
-    if occupate <= 24:
-        cutOff = 9
-        value, move = h_alphabeta_search(game, state, cutoff_depth(cutOff))
-        return move
-    if occupate <= 25:
-        cutOff = 10
-        value, move = h_alphabeta_search(game, state, cutoff_depth(cutOff))
-        return move
-    return None
+def iterative_deepening_search(game, state, deadline, max_depth=None, packed=False, inplace=False, quiescence=0):
+    """Esegue h_alphabeta_search a profondità 1, 2, 3, ... finché non si supera deadline
+    (un istante di time.perf_counter()) o max_depth, e restituisce (valore, mossa) dell'ultima
+    iterazione completata. Ogni iterazione esamina per prima la mossa migliore della precedente.
+    Se nemmeno la profondità 1 termina in tempo restituisce la prima mossa legale."""
+    moves = game.actions(state)
+    if not moves:
+        return None, None
+    value, move = None, moves[0]
+    depth = 1
+    while max_depth is None or depth <= max_depth:
+        reached = []
+        def cutoff(game, state, d):
+            if d > depth:
+                reached.append(True)
+                return True
+            return False
+        try:
+            value, move = h_alphabeta_search(game, state, cutoff, packed, inplace,
+                                              deadline=deadline, first_move=move, quiescence=quiescence)
+        except playingStrategies.SearchTimeout:
+            break
+        if not reached:
+            break  # l'albero è stato esplorato fino agli stati terminali: più profondità non cambia nulla
+        depth += 1
+    return value, move
 
 def cache1(function):
-    "Like lru_cache(None), but only considers the first argument of function."
+    """Like lru_cache(None). Boards hash by value (Zobrist key), so the remaining
+    arguments (alpha, beta, depth) are part of the key: the cached result is only
+    valid for the same search window and depth."""
     cache = {}
     def wrapped(x, *args):
-        if x not in cache:
-            cache[x] = function(x, *args)
-        return cache[x]
+        k = (x, args)
+        if k not in cache:
+            cache[k] = function(x, *args)
+        return cache[k]
     return wrapped
 
 def cutoff_depth(d):
     """A cutoff function that searches to depth d."""
     return lambda game, state, depth: depth > d
 
-def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
+def h_alphabeta_search(game, state, cutoff=cutoff_depth(2), packed=False, inplace=False,
+                       deadline=None, first_move=None, quiescence=0):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    With packed=True the search runs on the compact PackedBoard representation.
+    With inplace=True the moves are applied with game.make_move/unmake_move on a single board.
+    With a deadline (a time.perf_counter() value) playingStrategies.SearchTimeout is raised
+    once it is passed; first_move, if legal, is searched first at the root.
+    With quiescence=n > 0 the positions at the cutoff are extended with up to n plies of
+    captures (playingStrategies.quiescence_search) before h is applied."""
 
     player = state.to_move
+    if packed:
+        state = state.to_packed()
+    if inplace:
+        state = state.copy()
 
-    @cache1
     def max_value(state, alpha, beta, depth):
+        if deadline is not None and time.perf_counter() > deadline:
+            raise playingStrategies.SearchTimeout()
         if game.is_terminal(state):
             return game.utility(state, player), None
         if cutoff(game, state, depth):
+            if quiescence:
+                return playingStrategies.quiescence_search(game, state, player, alpha, beta, quiescence,
+                                                           h, inplace=inplace), None
             return h(game, state, player), None
         v, move = -infinity, None
-        for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta, depth+1)
+        moves = game.actions(state)
+        if depth == 0 and first_move in moves:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        for a in moves:
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = min_value(state, alpha, beta, depth+1)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = min_value(game.result(state, a), alpha, beta, depth+1)
             if v2 > v:
                 v, move = v2, a
                 alpha = max(alpha, v)
@@ -74,15 +100,25 @@ def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
                 return v, move
         return v, move
 
-    @cache1
     def min_value(state, alpha, beta, depth):
+        if deadline is not None and time.perf_counter() > deadline:
+            raise playingStrategies.SearchTimeout()
         if game.is_terminal(state):
             return game.utility(state, player), None
         if cutoff(game, state, depth):
+            if quiescence:
+                # quiescence_search vede valore e finestra dal lato di chi muove, qui l'avversario.
+                return -playingStrategies.quiescence_search(game, state, player, -beta, -alpha, quiescence,
+                                                            h, inplace=inplace), None
             return h(game, state, player), None
         v, move = +infinity, None
         for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta, depth + 1)
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = max_value(state, alpha, beta, depth + 1)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = max_value(game.result(state, a), alpha, beta, depth + 1)
             if v2 < v:
                 v, move = v2, a
                 beta = min(beta, v)
@@ -90,6 +126,10 @@ def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
                 return v, move
         return v, move
 
+    if not inplace:
+        # cache1 usa lo stato come chiave: non si può usare se la board viene modificata sul posto.
+        max_value, min_value = cache1(max_value), cache1(min_value)
+
     return max_value(state, -infinity, +infinity, 0)
 
 def h(game, board, player):
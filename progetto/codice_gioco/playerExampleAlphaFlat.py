@@ -1,11 +1,24 @@
 import itertools
 import playingStrategies
+import pondering
 
 
 # Gruppo MAD
 # Nome: Marco Pio Agatino D'Agosta 268999, Anastasia Martucci 271316, Domenico Macrì 269798
 
 
+# Pesi di h, letti anche da boardBatch.h_alpha_flat.
+W_DADI = 1.5
+W_VAL_DADI = 0.3
+W_POTENZIALE_CATTURA = 1.8
+W_CATTURA = 2.0
+W_LIBERTA = 0.2
+W_CENTRO = 0.4
+W_ANGOLI = 0.1
+W_SEI = 0.5
+W_VULNERABILITA = 1.0
+W_VICINI = 0.3
+
 def h(game, state, player):
     board = state.board
     n = state.size
@@ -14,17 +27,6 @@ def h(game, state, player):
 
     center = n // 2
 
-    W_DADI = 1.5
-    W_VAL_DADI = 0.3
-    W_POTENZIALE_CATTURA = 1.8
-    W_CATTURA = 2.0
-    W_LIBERTA = 0.2
-    W_CENTRO = 0.4
-    W_ANGOLI = 0.1
-    W_SEI = 0.5
-    W_VULNERABILITA = 1.0
-    W_VICINI = 0.3
-
     alleato_count = opp_count = alleato_valoreDadi = opp_valoreDadi = 0
     sei_alleati = sei_opp = 0
     spazio_alleato = spazio_opp = 0
@@ -134,12 +136,20 @@ def h(game, state, player):
     return score
 
 
-playingStrategies.h = h
+PONDER = False  # ricerca ad approfondimento iterativo anche nel turno avversario (pondering.py)
+STATS = False   # stampa i contatori della ricerca a ogni mossa
 
 
 def playerStrategy(game, state):
+    if PONDER:
+        return pondering.ponderer(game, lambda game: pondering.AlphaBetaEngine(game, h)).play(state)
     cutOff = 3
-    value, move = playingStrategies.h_alphabeta_search(game, state, playingStrategies.cutoff_depth(cutOff))
+    stats = playingStrategies.SearchStats() if STATS else None
+    # La ricerca negamax riceve direttamente la nostra h, senza sostituire playingStrategies.h
+    value, move = playingStrategies.negamax_search(game, state, h, playingStrategies.cutoff_depth(cutOff),
+                                                   ordering=playingStrategies.MoveOrdering(), stats=stats)
+    if stats is not None:
+        print(stats.record(player=state.to_move, move=move, value=value))
 
     return move
 
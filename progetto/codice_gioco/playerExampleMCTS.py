@@ -1,5 +1,30 @@
-from progetto.codice_gioco.playingStrategies import monte_carlo_tree_search
+import time
+
+import playingStrategies
+import pondering
+from utils4e import MCT_Node
+
+PONDER = False  # l'albero cresce anche nel turno avversario (pondering.py)
+STATS = False   # stampa i playout e i nodi riusati a ogni mossa
 
 
 def playerStrategy(game, state):
-    return monte_carlo_tree_search(state, game, 2000)
+    if PONDER:
+        return pondering.ponderer(game, lambda game: pondering.MCTSEngine(game, 2000)).play(state)
+    # Il numero di playout che stanno nel tempo varia molto tra apertura e finale:
+    # si gioca a tempo e non con un numero fisso di playout.
+    deadline = time.perf_counter() + playingStrategies.TIME_LIMIT
+    # L'albero della mossa precedente resta: si riparte dal nipote con la posizione arrivata
+    # (la nostra mossa seguita dalla risposta dell'avversario) e dalle sue statistiche.
+    tree = playingStrategies.per_game(game, __name__, lambda game: {"root": None})
+    root = playingStrategies.mcts_subtree(tree["root"], state)
+    if root is None:
+        root = MCT_Node(state=state)
+    tree["root"] = root
+    reused = root.N
+    stats = playingStrategies.SearchStats() if STATS else None
+    move = playingStrategies.monte_carlo_tree_search(state, game, None, root=root, stats=stats,
+                                                     deadline=deadline)
+    if stats is not None:
+        print(stats.record(player=state.to_move, move=move, reused=reused))
+    return move
@@ -1,208 +1,630 @@
+import atexit
 import math
+import time
 import copy
 import itertools
+import multiprocessing
 import random
 from collections import namedtuple
 
 import numpy as np
 
+import playoutKernel
 from utils4e import vector_add, MCT_Node, ucb
 
-def minimax_search(game, state):
-    """Search game tree to determine best move; return (value, move) pair."""
+def minimax_search(game, state, stats=None):
+    """Search game tree to determine best move; return (value, move) pair.
+    With stats (a SearchStats) the search counts nodes, leaves and depth reached."""
 
     player = state.to_move
 
-    def max_value(state):
+    def max_value(state, depth):
+        if stats is not None:
+            stats.node(depth)
         if game.is_terminal(state):
+            if stats is not None:
+                stats.leaves += 1
             return game.utility(state, player), None
         v, move = -infinity, None
         for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a))
+            v2, _ = min_value(game.result(state, a), depth + 1)
             if v2 > v:
                 v, move = v2, a
         return v, move
 
-    def min_value(state):
+    def min_value(state, depth):
+        if stats is not None:
+            stats.node(depth)
         if game.is_terminal(state):
+            if stats is not None:
+                stats.leaves += 1
             return game.utility(state, player), None
         v, move = +infinity, None
         for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a))
+            v2, _ = max_value(game.result(state, a), depth + 1)
             if v2 < v:
                 v, move = v2, a
         return v, move
 
-    return max_value(state)
+    return max_value(state, 0)
 
 infinity = math.inf
 
-def alphabeta_search(game, state):
-    """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
-
-    player = state.to_move
-
-    def max_value(state, alpha, beta):
-        if game.is_terminal(state):
-            return game.utility(state, player), None
-        v, move = -infinity, None
-        for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta)
-            if v2 > v:
-                v, move = v2, a
-                alpha = max(alpha, v)
-            if v >= beta:
-                return v, move
-        return v, move
-
-    def min_value(state, alpha, beta):
-        if game.is_terminal(state):
-            return game.utility(state, player), None
-        v, move = +infinity, None
-        for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta)
-            if v2 < v:
-                v, move = v2, a
-                beta = min(beta, v)
-            if v <= alpha:
-                return v, move
-        return v, move
-
-    return max_value(state, -infinity, +infinity)
-
-
-
-def cache1(function):
-    "Like lru_cache(None), but only considers the first argument of function."
-    cache = {}
-    def wrapped(x, *args):
-        if x not in cache:
-            cache[x] = function(x, *args)
-        return cache[x]
-    return wrapped
+# Secondi per mossa dei giocatori che cercano a tempo: la GUI concede 3 secondi (time_out),
+# il resto è il margine per creare la mossa e restituirla.
+TIME_LIMIT = 2.5
 
-
-def alphabeta_search_tt(game, state):
+def alphabeta_search(game, state, inplace=False, lazy=False, order=None, ordering=None, stats=None):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
-
-    player = state.to_move
-
-    @cache1
-    def max_value(state, alpha, beta):
-        if game.is_terminal(state):
-            return game.utility(state, player), None
-        v, move = -infinity, None
-        for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta)
-            if v2 > v:
-                v, move = v2, a
-                alpha = max(alpha, v)
-            if v >= beta:
-                return v, move
-        return v, move
-
-    @cache1
-    def min_value(state, alpha, beta):
-        if game.is_terminal(state):
-            return game.utility(state, player), None
-        v, move = +infinity, None
-        for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta)
-            if v2 < v:
-                v, move = v2, a
-                beta = min(beta, v)
-            if v <= alpha:
-                return v, move
-        return v, move
-
-    return max_value(state, -infinity, +infinity)
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    It is negamax_search without cutoff, table or principal variation search;
+    inplace, lazy, order, ordering and stats work as there."""
+    return negamax_search(game, state, cutoff=lambda game, state, depth: False, ordering=ordering,
+                          pvs=False, inplace=inplace, lazy=lazy, order=order, stats=stats)
+
+
+
+# Voce della tabella di trasposizione: chiave completa della posizione, profondità residua
+# con cui è stata cercata, valore, tipo di limite (EXACT, LOWER, UPPER) e mossa migliore.
+TTEntry = namedtuple("TTEntry", "key depth value bound move")
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# I valori delle ricerche sono dal punto di vista del giocatore alla radice: la chiave usata
+# nella tabella distingue le ricerche fatte per Blue da quelle fatte per Red.
+POV_KEYS = {"Blue": 0, "Red": 0x9E3779B97F4A7C15}
+
+class TranspositionTable:
+    """Tabella di trasposizione di dimensione fissa, indicizzata dalla chiave di Zobrist
+    della posizione (state.key). Ognuno degli `size` slot ha due voci: la prima viene
+    sostituita solo da ricerche almeno altrettanto profonde (depth-preferred), la seconda
+    sempre (always-replace). Una voce occupa circa 100 byte.
+    La stessa tabella può essere passata a più ricerche e mosse successive, purché
+    usino la stessa funzione di valutazione.
+    Di norma una voce cercata più in profondità risponde anche a richieste meno profonde, e il
+    valore può quindi differire da quello di alpha-beta senza tabella; con exact_depth=True si
+    usano solo voci della stessa profondità e i risultati non dipendono da cosa contiene la tabella."""
+
+    def __init__(self, size=1 << 16, exact_depth=False):
+        self.size = size
+        self.exact_depth = exact_depth
+        self.deep = [None] * size
+        self.recent = [None] * size
+
+    def clear(self):
+        self.deep = [None] * self.size
+        self.recent = [None] * self.size
+
+    def lookup(self, key):
+        """Restituisce la voce per key oppure None."""
+        i = key % self.size
+        entry = self.deep[i]
+        if entry is not None and entry.key == key:
+            return entry
+        entry = self.recent[i]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def probe(self, key, depth, alpha, beta):
+        """Restituisce (valore, mossa) se una voce cercata ad almeno `depth` basta a
+        decidere il nodo con finestra (alpha, beta), altrimenti None."""
+        entry = self.lookup(key)
+        if entry is None or entry.depth < depth or (self.exact_depth and entry.depth != depth):
+            return None
+        if (entry.bound == EXACT or (entry.bound == LOWER and entry.value >= beta)
+                or (entry.bound == UPPER and entry.value <= alpha)):
+            return entry.value, entry.move
+        return None
+
+    def store(self, key, depth, value, alpha, beta, move):
+        """Memorizza il risultato di una ricerca con finestra iniziale (alpha, beta)."""
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        entry = TTEntry(key, depth, value, bound, move)
+        i = key % self.size
+        deep = self.deep[i]
+        if deep is None or deep.key == key or depth >= deep.depth:
+            self.deep[i] = entry
+        else:
+            self.recent[i] = entry
+
+
+class MoveOrdering:
+    """Ordinamento delle mosse per le ricerche alpha-beta, con componenti attivabili
+    separatamente per misurare il contributo di ciascuna:
+    hash_move: per prima la mossa migliore salvata nella tabella di trasposizione;
+    captures: poi le catture, le più grandi per prime (come game.iter_actions(state, "captures"));
+    killers: poi le (al più due) mosse che hanno causato un taglio in altri nodi dello stesso ply;
+    history: a parità delle precedenti, le mosse con punteggio più alto nella history table,
+    che a ogni taglio aumenta di draft**2 il punteggio della mossa responsabile.
+    La history table è indicizzata dalla mossa stessa, cioè da (cella, pip, celle catturate):
+    le celle catturate di una mossa equivalgono alla sua maschera di cattura.
+    Lo stesso oggetto può essere passato a più ricerche, che ne condividono killer e history."""
+
+    def __init__(self, hash_move=True, killers=True, history=True, captures=True):
+        self.hash_move = hash_move
+        self.killers = killers
+        self.history = history
+        self.captures = captures
+        self.reset()
+
+    def reset(self):
+        self.killer_moves = {}
+        self.history_table = {}
+
+    def order(self, state, moves, ply, tt=None, key=None):
+        """Restituisce la lista delle mosse del nodo state (a distanza ply dalla radice) ordinata;
+        tt e key servono a cercare la mossa migliore salvata per il nodo."""
+        moves = list(moves)
+        best = None
+        if self.hash_move and tt is not None:
+            entry = tt.lookup(key)
+            if entry is not None:
+                best = entry.move
+        killers = self.killer_moves.get(ply, ()) if self.killers else ()
+        history = self.history_table if self.history else {}
+        player = state.to_move
+        def priority(move):
+            captured = move[2]
+            if self.captures and captured:
+                size = (len(captured), sum(state.get(r, c)[0] != player for r, c in captured))
+            else:
+                size = (0, 0)
+            return move == best, size, move in killers, history.get(move, 0)
+        moves.sort(key=priority, reverse=True)
+        return moves
+
+    def cutoff(self, move, ply, draft=None):
+        """Registra che move ha causato un taglio a distanza ply dalla radice, con profondità
+        residua draft (None o infinita se non nota)."""
+        if self.killers:
+            killers = self.killer_moves.setdefault(ply, [])
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[2:]
+        if self.history:
+            bonus = 1 if draft is None or draft == infinity else draft * draft
+            self.history_table[move] = self.history_table.get(move, 0) + bonus
+
+
+class SearchStats:
+    """Contatori di una ricerca, da passare come argomento stats a una qualunque ricerca di
+    questo modulo; con stats=None (il default) le ricerche non contano nulla e pagano solo un
+    confronto per nodo.
+    nodes: nodi visitati; leaves: foglie valutate (h o utility; i playout per MCTS);
+    tt_probes, tt_hits: interrogazioni della tabella di trasposizione e quelle che hanno deciso il
+    nodo; cutoffs[i]: tagli causati dalla mossa di indice i nel nodo (con un buon ordinamento
+    quasi tutti in cutoffs[0]); max_depth: distanza massima dalla radice;
+    iterations: (profondità, secondi, nodi) di ogni iterazione dell'approfondimento iterativo.
+    Il tempo si misura dalla creazione (o da reset) a stop. Lo stesso oggetto accumula più
+    ricerche; record() restituisce tutto come dizionario, un record per mossa."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = self.leaves = self.tt_probes = self.tt_hits = self.max_depth = 0
+        self.cutoffs = []
+        self.iterations = []
+        self.start = self._last = time.perf_counter()
+        self._last_nodes = 0
+        self.end = None
+
+    def node(self, depth):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def probe(self, hit):
+        self.tt_probes += 1
+        if hit is not None:
+            self.tt_hits += 1
+
+    def cutoff(self, index):
+        if index >= len(self.cutoffs):
+            self.cutoffs.extend([0] * (index + 1 - len(self.cutoffs)))
+        self.cutoffs[index] += 1
+
+    def iteration(self, depth):
+        """Registra la fine dell'iterazione a profondità depth."""
+        now = time.perf_counter()
+        self.iterations.append((depth, now - self._last, self.nodes - self._last_nodes))
+        self._last, self._last_nodes = now, self.nodes
+
+    def stop(self):
+        self.end = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    @property
+    def nps(self):
+        seconds = self.seconds
+        return self.nodes / seconds if seconds else 0.0
+
+    def record(self, **extra):
+        """Dizionario con tutti i contatori (e le voci extra, per esempio la mossa scelta)."""
+        if self.end is None:
+            self.stop()
+        record = dict(nodes=self.nodes, leaves=self.leaves, tt_probes=self.tt_probes,
+                      tt_hits=self.tt_hits, cutoffs=list(self.cutoffs), max_depth=self.max_depth,
+                      iterations=list(self.iterations), seconds=self.seconds, nps=self.nps)
+        record.update(extra)
+        return record
+
+
+def alphabeta_search_tt(game, state, inplace=False, lazy=False, order=None, tt=None, ordering=None, stats=None):
+    """Search game to determine best action; use alpha-beta pruning.
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    It is negamax_search without cutoff or principal variation search: the positions are kept
+    in the TranspositionTable tt with infinite depth. The other options work as there."""
+    return negamax_search(game, state, cutoff=cutoff_depth(infinity), tt=tt, ordering=ordering,
+                          pvs=False, inplace=inplace, lazy=lazy, order=order, stats=stats)
 
 def cutoff_depth(d):
-    """A cutoff function that searches to depth d."""
-    return lambda game, state, depth: depth > d
-
-def zero_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
+    """A cutoff function that searches to depth d.
+    The limit is also kept in its `depth` attribute, used by the transposition table."""
+    cutoff = lambda game, state, depth: depth > d
+    cutoff.depth = d
+    return cutoff
+
+def tt_draft(cutoff, depth):
+    """Profondità residua di un nodo a distanza depth dalla radice, per le voci della
+    tabella di trasposizione; None se cutoff non è stato creato con cutoff_depth."""
+    limit = getattr(cutoff, "depth", None)
+    return None if limit is None else limit + 1 - depth
+
+def quiescence_search(game, state, player, alpha, beta, depth, h, moves=None, inplace=False):
+    """Capture-only quiescence search: up to depth more plies of capture moves from state.
+    The value and the window (alpha, beta) are for the player to move in state, as in negamax;
+    h(game, state, player) is the static value for player. The side to move may stop capturing
+    and keep the static value (stand pat). moves(state) gives the moves (game.actions if None);
+    with inplace=True the captures are applied with game.make_move/unmake_move."""
+    if moves is None:
+        moves = game.actions
+    sign = 1 if state.to_move == player else -1
+    if game.is_terminal(state):
+        return sign * game.utility(state, player)
+    v = sign * h(game, state, player)
+    if depth == 0 or v >= beta:
+        return v
+    alpha = max(alpha, v)
+    for a in moves(state):
+        if not a[2]:
+            continue  # solo le catture
+        if inplace:
+            undo = game.make_move(state, a)
+            v2 = -quiescence_search(game, state, player, -beta, -alpha, depth - 1, h, moves, inplace)
+            game.unmake_move(state, undo)
+        else:
+            v2 = -quiescence_search(game, game.result(state, a), player, -beta, -alpha, depth - 1, h, moves, inplace)
+        if v2 > v:
+            v = v2
+            alpha = max(alpha, v)
+        if v >= beta:
+            break
+    return v
+
+def zero_alphabeta_search(game, state, cutoff=cutoff_depth(2), inplace=False, lazy=False, order=None, tt=None, ordering=None, stats=None):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
-
-    player = state.to_move
-
-    @cache1
-    def max_value(state, alpha, beta, depth):
-        if game.is_terminal(state):
-            return game.utility(state, player), None
-        if cutoff(game, state, depth):
-            return 0, None
-        v, move = -infinity, None
-        for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta, depth+1)
-            if v2 > v:
-                v, move = v2, a
-                alpha = max(alpha, v)
-            if v >= beta:
-                return v, move
-        return v, move
-
-    @cache1
-    def min_value(state, alpha, beta, depth):
-        if game.is_terminal(state):
-            return game.utility(state, player), None
-        if cutoff(game, state, depth):
-            return 0, None
-        v, move = +infinity, None
-        for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta, depth + 1)
-            if v2 < v:
-                v, move = v2, a
-                beta = min(beta, v)
-            if v <= alpha:
-                return v, move
-        return v, move
-
-    return max_value(state, -infinity, +infinity, 0)
-
-def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    It is negamax_search without principal variation search, with the value 0 at the cutoff;
+    the options work as there."""
+    return negamax_search(game, state, lambda game, state, player: 0, cutoff, tt=tt, ordering=ordering,
+                          pvs=False, inplace=inplace, lazy=lazy, order=order, stats=stats)
+
+def h_alphabeta_search(game, state, cutoff=cutoff_depth(2), packed=False, inplace=False, lazy=False, order=None, tt=None, ordering=None,
+                       quiescence=0, stats=None):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
-
-    player = state.to_move
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    It is negamax_search without principal variation search, with h at the cutoff;
+    the options work as there."""
+    return negamax_search(game, state, None, cutoff, tt=tt, ordering=ordering, pvs=False, packed=packed,
+                          inplace=inplace, lazy=lazy, order=order, quiescence=quiescence, stats=stats)
+
+
+class SearchTimeout(Exception):
+    """Sollevata da negamax_search quando si supera la scadenza."""
+
+def negamax_search(game, state, h=None, cutoff=cutoff_depth(2), alpha=-infinity, beta=+infinity,
+                   tt=None, ordering=None, pvs=True, packed=False, inplace=False, lazy=False, order=None,
+                   deadline=None, quiescence=0, player=None, stop=None, stats=None):
+    """Search game to determine best action with negamax alpha-beta; return (value, move).
+    A single search for all the players, also behind alphabeta_search, alphabeta_search_tt,
+    zero_alphabeta_search and h_alphabeta_search: h(game, state, player) is the evaluation at
+    the cutoff (playingStrategies.h if None).
+    Values are from the point of view of the player to move at the root, as in [Figure 5.7]:
+    negamax negates them in the nodes of the opponent, so the result is the same as with
+    max_value/min_value even when h and utility are not symmetric between the players.
+    With pvs=True (principal variation search) every move after the first is searched with a
+    null window and re-searched only if it turns out better. (alpha, beta) is the root window:
+    with a narrower one (aspiration) the value is exact only if alpha < value < beta.
+    With packed=True the search runs on the compact PackedBoard representation.
+    With inplace=True the moves are applied with game.make_move/unmake_move on a single board.
+    With lazy=True the moves come one at a time from game.iter_actions(state, order),
+    so a cutoff stops the move generation too; with order="captures" all the captures are
+    generated up front to sort them, and only the quiet placements are skipped.
+    With an ordering (a MoveOrdering) the moves of every node are searched in its order.
+    The positions already searched are kept in the TranspositionTable tt (a new one for
+    this search if tt is None); it is used only when cutoff comes from cutoff_depth.
+    With a deadline (a time.perf_counter() value) SearchTimeout is raised once it is passed,
+    and also once stop (a threading.Event) is set: another thread can cancel the search.
+    With quiescence=n > 0 the positions at the cutoff are not evaluated at once: up to n more
+    plies of capture moves are searched (quiescence_search), and each player may also stop
+    capturing and keep the static value h (stand pat). A table should not be shared between
+    searches with different quiescence.
+    player is the point of view of values and window (the player to move at the root if None).
+    With stats (a SearchStats) the search counts nodes, leaves, table probes, cutoffs and depth reached."""
+
+    # h si legge qui e non come valore di default, così funziona anche chi sostituisce playingStrategies.h.
+    evaluate = h if h is not None else globals()["h"]
+    if player is None:
+        player = state.to_move
+    moves = (lambda state: game.iter_actions(state, order)) if lazy else game.actions
+    if packed:
+        state = state.to_packed()
+    if inplace:
+        state = state.copy()
+    if tt is None:
+        tt = TranspositionTable()
+    pov = POV_KEYS[player]
+
+    def ordered(state, depth):
+        if ordering is None:
+            return moves(state)
+        return ordering.order(state, moves(state), depth, tt, state.key ^ pov)
+
+    def child_value(state, a, alpha, beta, depth):
+        if inplace:
+            undo = game.make_move(state, a)
+            v, _ = negamax(state, -beta, -alpha, depth + 1)
+            game.unmake_move(state, undo)
+        else:
+            v, _ = negamax(game.result(state, a), -beta, -alpha, depth + 1)
+        return -v
 
-    @cache1
-    def max_value(state, alpha, beta, depth):
+    def negamax(state, alpha, beta, depth):
+        if deadline is not None and time.perf_counter() > deadline:
+            raise SearchTimeout()
+        if stop is not None and stop.is_set():
+            raise SearchTimeout()
+        if stats is not None:
+            stats.node(depth)
+        sign = 1 if state.to_move == player else -1
         if game.is_terminal(state):
-            return game.utility(state, player), None
+            if stats is not None:
+                stats.leaves += 1
+            return sign * game.utility(state, player), None
         if cutoff(game, state, depth):
-            return h(game, state, player), None
+            if stats is not None:
+                stats.leaves += 1
+            if quiescence:
+                return quiescence_search(game, state, player, alpha, beta, quiescence, evaluate, moves, inplace), None
+            return sign * evaluate(game, state, player), None
+        # La tabella di trasposizione conserva i valori dal punto di vista della radice,
+        # come le altre ricerche: la finestra e il valore si convertono con sign.
+        draft = tt_draft(cutoff, depth)
+        if draft is not None:
+            hit = tt.probe(state.key ^ pov, draft, *((alpha, beta) if sign > 0 else (-beta, -alpha)))
+            if stats is not None:
+                stats.probe(hit)
+            if hit is not None:
+                return sign * hit[0], hit[1]
+        alpha0 = alpha
         v, move = -infinity, None
-        for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta, depth+1)
+        for i, a in enumerate(ordered(state, depth)):
+            if pvs and i > 0:
+                # Finestra nulla (alpha, numero successivo ad alpha): basta a sapere se a è migliore.
+                v2 = child_value(state, a, alpha, math.nextafter(alpha, infinity), depth)
+                if alpha < v2 < beta:
+                    v2 = child_value(state, a, alpha, beta, depth)
+            else:
+                v2 = child_value(state, a, alpha, beta, depth)
             if v2 > v:
                 v, move = v2, a
                 alpha = max(alpha, v)
             if v >= beta:
-                return v, move
-        return v, move
-
-    @cache1
-    def min_value(state, alpha, beta, depth):
-        if game.is_terminal(state):
-            return game.utility(state, player), None
-        if cutoff(game, state, depth):
-            return h(game, state, player), None
-        v, move = +infinity, None
-        for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta, depth + 1)
-            if v2 < v:
-                v, move = v2, a
-                beta = min(beta, v)
-            if v <= alpha:
-                return v, move
+                if stats is not None:
+                    stats.cutoff(i)
+                if ordering is not None:
+                    ordering.cutoff(a, depth, draft)
+                break
+        if draft is not None:
+            tt.store(state.key ^ pov, draft, sign * v,
+                     *((alpha0, beta) if sign > 0 else (-beta, -alpha0)), move)
         return v, move
 
-    return max_value(state, -infinity, +infinity, 0)
-
+    if state.to_move != player:
+        v, move = negamax(state, -beta, -alpha, 0)
+        return -v, move
+    return negamax(state, alpha, beta, 0)
+
+def iterative_negamax_search(game, state, h=None, max_depth=None, deadline=None, aspiration=None,
+                             tt=None, ordering=None, **options):
+    """Iterative deepening around negamax_search: depth 1, 2, ... up to max_depth or until
+    deadline (a time.perf_counter() value) or until the `stop` option is set;
+    return (value, move) of the last completed depth.
+    The TranspositionTable and the MoveOrdering (new ones if None) are shared by the iterations,
+    so each one starts from the best moves of the previous.
+    With aspiration (a width) every iteration after the first searches the window
+    (previous value - aspiration, previous value + aspiration) and repeats the search with the
+    full window only if the value falls outside. The other options go to negamax_search;
+    with the `stats` option (a SearchStats) each completed depth is also recorded in stats.iterations."""
+    if max_depth is None and deadline is None and options.get("stop") is None:
+        raise ValueError("serve max_depth, deadline oppure stop")
+    moves = game.actions(state)
+    if not moves:
+        return None, None
+    if tt is None:
+        tt = TranspositionTable()
+    if ordering is None:
+        ordering = MoveOrdering()
+    value, move = None, moves[0]
+    depth = 1
+    while max_depth is None or depth <= max_depth:
+        search = lambda alpha, beta: negamax_search(game, state, h, cutoff_depth(depth), alpha, beta,
+                                                    tt, ordering, deadline=deadline, **options)
+        try:
+            if aspiration is not None and value is not None:
+                alpha, beta = value - aspiration, value + aspiration
+                v, m = search(alpha, beta)
+                if v <= alpha or v >= beta:
+                    v, m = search(-infinity, +infinity)
+            else:
+                v, m = search(-infinity, +infinity)
+        except SearchTimeout:
+            break
+        value, move = v, m
+        if options.get("stats") is not None:
+            options["stats"].iteration(depth)
+        depth += 1
+    return value, move
+
+
+# Stato di ogni processo creato da worker_pool, impostato all'avvio del processo.
+worker = {}
+
+def _init_worker(game, h, extra):
+    worker.update(game=game, h=h, tt=TranspositionTable(), ordering=MoveOrdering(), **extra)
+
+def worker_pool(workers, game, h=None, **extra):
+    """multiprocessing.Pool di `workers` processi (None: uno per core) per le ricerche con negamax_search.
+    All'avvio ogni processo trova in playingStrategies.worker game, h, una TranspositionTable (tt)
+    e una MoveOrdering (ordering) proprie, che restano tra un compito e l'altro, più le voci di extra.
+    h e le funzioni dei compiti devono essere definite a livello di modulo, così i processi possono
+    riceverle."""
+    return multiprocessing.Pool(workers, _init_worker, (game, h, extra))
+
+# Oggetti creati da per_game: (key, id(game)) -> (game, oggetto). Il riferimento a game impedisce
+# che il suo id venga riusato da una partita nuova.
+_per_game = {}
+
+def per_game(game, key, make):
+    """Oggetto del giocatore key (di solito il nome del suo modulo) per la partita game: creato alla
+    prima chiamata con make(game) e poi riusato, così quello che contiene (processi, tabelle, alberi)
+    resta tra una chiamata di playerStrategy e l'altra. Se l'oggetto ha un metodo close, viene
+    chiamato all'uscita del programma."""
+    entry = _per_game.get((key, id(game)))
+    if entry is None:
+        made = make(game)
+        if hasattr(made, "close"):
+            atexit.register(made.close)
+        entry = _per_game[(key, id(game))] = (game, made)
+    return entry[1]
+
+
+class EndgameSolver:
+    """Risolutore esatto per le posizioni di fine partita: cerca fino agli stati terminali
+    e restituisce il valore teorico (1 vittoria, -1 sconfitta per il giocatore di turno
+    alla radice) con una mossa che lo realizza.
+    Con due soli valori possibili ogni nodo si ferma alla prima mossa vincente e il suo
+    risultato è sempre esatto: la tabella di trasposizione del risolutore (separata da quelle
+    delle ricerche euristiche) conserva quindi valori dimostrati, validi a qualunque profondità.
+    Una partita non può ripetere una posizione (ogni mossa aumenta la somma dei pip sulla
+    board oppure, catturando, diminuisce il numero di celle occupate): la ricerca termina.
+    Il vincitore si ricava da game.utility(state, "Blue"), corretto per entrambi i giocatori.
+    La difficoltà non dipende solo dalle celle vuote: una cattura ne libera fino a quattro e
+    riapre la partita, per questo solve accetta una scadenza come negamax_search.
+    Dopo ogni solve restano disponibili nodes, tt_hits, seconds e nps."""
+
+    def __init__(self, game, tt=None, ordering=None):
+        self.game = game
+        self.tt = tt if tt is not None else TranspositionTable(1 << 18)
+        self.ordering = ordering if ordering is not None else MoveOrdering()
+        self.nodes = self.tt_hits = 0
+        self.seconds = 0.0
+
+    @property
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def solve(self, state, deadline=None):
+        """Restituisce (valore, mossa) dimostrati per il giocatore di turno in state.
+        Con una deadline (un istante di time.perf_counter()) solleva SearchTimeout quando la
+        supera; le posizioni già dimostrate restano nella tabella per la chiamata successiva."""
+        game, tt, ordering = self.game, self.tt, self.ordering
+        self.nodes = self.tt_hits = 0
+        start = time.perf_counter()
+        # Si lavora sul posto su una PackedBoard privata (va bene anche partendo da una FrozenBoard).
+        state = state.to_packed().copy()
+        state.movegen = None
+
+        def negamax(state, ply):
+            self.nodes += 1
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchTimeout()
+            if game.is_terminal(state):
+                blue = game.utility(state, "Blue")
+                return (blue if state.to_move == "Blue" else -blue), None
+            entry = tt.lookup(state.key)
+            if entry is not None:
+                self.tt_hits += 1
+                return entry.value, entry.move
+            v, move = -1, None
+            for a in ordering.order(state, game.actions(state), ply, tt, state.key):
+                undo = game.make_move(state, a)
+                v2 = -negamax(state, ply + 1)[0]
+                game.unmake_move(state, undo)
+                if move is None or v2 > v:
+                    v, move = v2, a
+                if v == 1:
+                    ordering.cutoff(a, ply)
+                    break
+            tt.store(state.key, infinity, v, -infinity, +infinity, move)
+            return v, move
+
+        try:
+            return negamax(state, 0)
+        finally:
+            self.seconds = time.perf_counter() - start
+
+def endgame_benchmark(game, empties=range(1, 9), samples=5, seed=0, time_limit=10.0):
+    """Risolve `samples` posizioni casuali (partite giocate a caso fino a n celle vuote) per ogni
+    n in empties e stampa quante sono state risolte entro time_limit secondi, i nodi e il
+    tempo medi e i nodi al secondo, per scegliere da quante celle vuote in giù passare dalla
+    ricerca euristica al risolutore. Restituisce le righe stampate come tuple."""
+    rng = random.Random(seed)
+    rows = []
+    for n_empty in empties:
+        solved = nodes = seconds = 0
+        for _ in range(samples):
+            state = game.initial
+            while game.is_terminal(state) or state.empty > n_empty:
+                if game.is_terminal(state):
+                    state = game.initial
+                state = game.result(state, rng.choice(game.actions(state)))
+            solver = EndgameSolver(game)
+            try:
+                solver.solve(state, time.perf_counter() + time_limit)
+                solved += 1
+            except SearchTimeout:
+                pass
+            nodes += solver.nodes
+            seconds += solver.seconds
+        row = (n_empty, solved, samples, nodes / samples, seconds / samples,
+               nodes / seconds if seconds else 0.0)
+        print("vuote %2d: risolte %d/%d  %10.0f nodi  %8.3f s  %9.0f nodi/s" % row)
+        rows.append(row)
+    return rows
+
+
+# Pesi di h e di evaluate_position / evaluate_position_enemy, letti anche da boardBatch.h_playing_strategies.
+W_TERRITORIO = 3.5
+W_PIP_MEDI = 1.5
+W_CENTRO = 2
+W_MEDIO = 2.5
+W_ANGOLO = 3
+W_BORDO = 1.5
+W_SEI = 1.5
+W_SEI_PROPRIO = 4.5
+W_SEI_AVVERSARIO = 5
+W_MINACCIATO = 3
+W_VICINI_OCCUPATI = 1.25
 
 def h(game, board, player):
     """Valuta la posizione del gioco e restituisce un valore euristico per il giocatore."""
@@ -213,7 +635,7 @@ def h(game, board, player):
     player_territory = board.count(player)
     opponent_territory = board.count(avversario)
 
-    score += 3.5 * (player_territory - opponent_territory) # Controllo del territorio
+    score += W_TERRITORIO * (player_territory - opponent_territory) # Controllo del territorio
     somma_p = 0
     somma_a = 0
     for row in range(5):
@@ -229,7 +651,7 @@ def h(game, board, player):
                     score -= evaluate_position_enemy(row, col, board) # Penalizza la posizione dell'unità dell'avversario
                     somma_a += val if 1 < val < 6 else 0
 
-    return score + 1.5 * (somma_p - somma_a)
+    return score + W_PIP_MEDI * (somma_p - somma_a)
 
 def evaluate_position_enemy(row, col, board):
     """Valuta la posizione di un'unità in base alla sua posizione sulla griglia."""
@@ -262,7 +684,7 @@ def evaluate_position_enemy(row, col, board):
     if n_vicini == 4:
         vicini_occupati += 1
     if board.board[row][col][1] == 6:
-        sei += 1.5
+        sei += W_SEI
 
     for (r, c) in vicini:
         if board.board[r][c] is None:
@@ -285,13 +707,13 @@ def evaluate_position_enemy(row, col, board):
     #             minaccia_avversario += 1
 
     return (
-        2 * centro +
-        2.5 * medio +
-        3 * angolo +
-        1.5 * bordo +
-        5 * sei -
-        3 * minacciato +
-        1.25 * vicini_occupati
+        W_CENTRO * centro +
+        W_MEDIO * medio +
+        W_ANGOLO * angolo +
+        W_BORDO * bordo +
+        W_SEI_AVVERSARIO * sei -
+        W_MINACCIATO * minacciato +
+        W_VICINI_OCCUPATI * vicini_occupati
     )
 
 def evaluate_position(row, col, board):
@@ -325,7 +747,7 @@ def evaluate_position(row, col, board):
     if n_vicini == 4:
         vicini_occupati += 1
     if board.board[row][col][1] == 6:
-        sei += 1.5
+        sei += W_SEI
 
     for (r, c) in vicini:
         if board.board[r][c] is None:
@@ -348,13 +770,13 @@ def evaluate_position(row, col, board):
     #             minaccia_avversario += 1
 
     return (
-        2 * centro +
-        2.5 * medio +
-        3 * angolo +
-        1.5 * bordo +
-        4.5 * sei -
-        3 * minacciato +
-        1.25 * vicini_occupati
+        W_CENTRO * centro +
+        W_MEDIO * medio +
+        W_ANGOLO * angolo +
+        W_BORDO * bordo +
+        W_SEI_PROPRIO * sei -
+        W_MINACCIATO * minacciato +
+        W_VICINI_OCCUPATI * vicini_occupati
     )
 
 def neighbors(row, col, board):
@@ -372,13 +794,28 @@ def neighbors(row, col, board):
 # ______________________________________________________________________________
 # Monte Carlo Tree Search
 
-
-def monte_carlo_tree_search(state, game, N=1000):
-    def select(n):
+# Playout tra due letture dell'orologio di monte_carlo_tree_search.
+MCTS_CLOCK_EVERY = 8
+
+def monte_carlo_tree_search(state, game, N=1000, root=None, stop=None, stats=None, deadline=None):
+    """Run N playouts from state and return the move of the most visited child.
+    With a deadline (a time.perf_counter() value) the search also ends once it is passed, after at
+    least one playout; the clock is read every MCTS_CLOCK_EVERY playouts. N=None means no playout
+    limit, so a deadline or stop is needed.
+    root, if given, is the MCT_Node of state from an earlier search: its tree keeps growing,
+    with the statistics it already has. The search ends early once stop (a threading.Event) is set.
+    With stats (a SearchStats) the search counts the tree nodes created (nodes), the playouts
+    (leaves, i.e. how many playouts fitted in the time) and the depth of the deepest selected node."""
+    if N is None and deadline is None and stop is None:
+        raise ValueError("serve N, deadline oppure stop")
+
+    def select(n, depth=0):
         """select a leaf node in the tree"""
         if n.children:
-            return select(max(n.children.keys(), key=ucb))
+            return select(max(n.children.keys(), key=ucb), depth + 1)
         else:
+            if stats is not None and depth > stats.max_depth:
+                stats.max_depth = depth
             return n
 
     def expand(n):
@@ -386,15 +823,14 @@ def monte_carlo_tree_search(state, game, N=1000):
         if not n.children and not game.is_terminal(n.state):
             n.children = {MCT_Node(state=game.result(n.state, action), parent=n): action
                           for action in game.actions(n.state)}
+            if stats is not None:
+                stats.nodes += len(n.children)
         return select(n)
 
     def simulate(game, state):
         """simulate the utility of current state by random picking a step"""
         player = state.to_move
-        while not game.is_terminal(state):
-            action = random.choice(list(game.actions(state)))
-            state = game.result(state, action)
-        v = game.utility(state, player)
+        v = 1 if playoutKernel.random_playout(game, state) == player else -1
         return -v
 
     def backprop(n, utility):
@@ -407,17 +843,45 @@ def monte_carlo_tree_search(state, game, N=1000):
         if n.parent:
             backprop(n.parent, -utility)
 
-    root = MCT_Node(state=state)
+    if root is None:
+        root = MCT_Node(state=state)
 
-    for _ in range(N):
+    playouts = 0
+    while N is None or playouts < N:
+        if stop is not None and stop.is_set():
+            break
         leaf = select(root)
         child = expand(leaf)
         result = simulate(game, child.state)
         backprop(child, result)
-
+        playouts += 1
+        if stats is not None:
+            stats.leaves += 1
+        if deadline is not None and playouts % MCTS_CLOCK_EVERY == 0 and time.perf_counter() > deadline:
+            break
+
+    if not root.children:
+        return None  # fermata prima del primo playout
     max_state = max(root.children, key=lambda p: p.N)
 
     return root.children.get(max_state)
 
+def mcts_subtree(root, state, plies=2):
+    """Return the node of the tree of root, at most `plies` levels below it, whose position is
+    state (compared by Zobrist key, not by identity), detached from its parent so that the rest of
+    the old tree can be freed; None if there is no such node.
+    With plies=2, after our move and the opponent's reply, the search for the new position starts
+    from the statistics already collected for it."""
+    if root is None:
+        return None
+    level = [root]
+    for _ in range(plies):
+        level = [child for node in level for child in node.children]
+        for node in level:
+            if node.state.key == state.key:
+                node.parent = None
+                return node
+    return None
+
 
 
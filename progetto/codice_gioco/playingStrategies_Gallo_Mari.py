@@ -34,18 +34,26 @@ def minimax_search(game, state):
 
 infinity = math.inf
 
-def alphabeta_search(game, state):
+def alphabeta_search(game, state, inplace=False):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    With inplace=True the moves are applied with game.make_move/unmake_move on a single board."""
 
     player = state.to_move
+    if inplace:
+        state = state.copy()
 
     def max_value(state, alpha, beta):
         if game.is_terminal(state):
             return game.utility(state, player), None
         v, move = -infinity, None
         for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta)
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = min_value(state, alpha, beta)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = min_value(game.result(state, a), alpha, beta)
             if v2 > v:
                 v, move = v2, a
                 alpha = max(alpha, v)
@@ -58,7 +66,12 @@ def alphabeta_search(game, state):
             return game.utility(state, player), None
         v, move = +infinity, None
         for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta)
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = max_value(state, alpha, beta)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = max_value(game.result(state, a), alpha, beta)
             if v2 < v:
                 v, move = v2, a
                 beta = min(beta, v)
@@ -71,28 +84,38 @@ def alphabeta_search(game, state):
 
 
 def cache1(function):
-    "Like lru_cache(None), but only considers the first argument of function."
+    """Like lru_cache(None). Boards hash by value (Zobrist key), so the remaining
+    arguments (alpha, beta, depth) are part of the key: the cached result is only
+    valid for the same search window and depth."""
     cache = {}
     def wrapped(x, *args):
-        if x not in cache:
-            cache[x] = function(x, *args)
-        return cache[x]
+        k = (x, args)
+        if k not in cache:
+            cache[k] = function(x, *args)
+        return cache[k]
     return wrapped
 
 
-def alphabeta_search_tt(game, state):
+def alphabeta_search_tt(game, state, inplace=False):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    With inplace=True the moves are applied with game.make_move/unmake_move on a single board."""
 
     player = state.to_move
+    if inplace:
+        state = state.copy()
 
-    @cache1
     def max_value(state, alpha, beta):
         if game.is_terminal(state):
             return game.utility(state, player), None
         v, move = -infinity, None
         for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta)
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = min_value(state, alpha, beta)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = min_value(game.result(state, a), alpha, beta)
             if v2 > v:
                 v, move = v2, a
                 alpha = max(alpha, v)
@@ -100,13 +123,17 @@ def alphabeta_search_tt(game, state):
                 return v, move
         return v, move
 
-    @cache1
     def min_value(state, alpha, beta):
         if game.is_terminal(state):
             return game.utility(state, player), None
         v, move = +infinity, None
         for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta)
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = max_value(state, alpha, beta)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = max_value(game.result(state, a), alpha, beta)
             if v2 < v:
                 v, move = v2, a
                 beta = min(beta, v)
@@ -114,19 +141,28 @@ def alphabeta_search_tt(game, state):
                 return v, move
         return v, move
 
+    if not inplace:
+        # cache1 usa lo stato come chiave: non si può usare se la board viene modificata sul posto.
+        max_value, min_value = cache1(max_value), cache1(min_value)
+
     return max_value(state, -infinity, +infinity)
 
 def cutoff_depth(d):
     """A cutoff function that searches to depth d."""
     return lambda game, state, depth: depth > d
 
-def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
+def h_alphabeta_search(game, state, cutoff=cutoff_depth(2), packed=False, inplace=False):
     """Search game to determine best action; use alpha-beta pruning.
-    As in [Figure 5.7], this version searches all the way to the leaves."""
+    As in [Figure 5.7], this version searches all the way to the leaves.
+    With packed=True the search runs on the compact PackedBoard representation.
+    With inplace=True the moves are applied with game.make_move/unmake_move on a single board."""
 
     player = state.to_move
+    if packed:
+        state = state.to_packed()
+    if inplace:
+        state = state.copy()
 
-    @cache1
     def max_value(state, alpha, beta, depth):
         if game.is_terminal(state):
             return game.utility(state, player), None
@@ -134,7 +170,12 @@ def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
             return h(game, state, player), None
         v, move = -infinity, None
         for a in game.actions(state):
-            v2, _ = min_value(game.result(state, a), alpha, beta, depth+1)
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = min_value(state, alpha, beta, depth+1)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = min_value(game.result(state, a), alpha, beta, depth+1)
             if v2 > v:
                 v, move = v2, a
                 alpha = max(alpha, v)
@@ -142,7 +183,6 @@ def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
                 return v, move
         return v, move
 
-    @cache1
     def min_value(state, alpha, beta, depth):
         if game.is_terminal(state):
             return game.utility(state, player), None
@@ -150,7 +190,12 @@ def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
             return h(game, state, player), None
         v, move = +infinity, None
         for a in game.actions(state):
-            v2, _ = max_value(game.result(state, a), alpha, beta, depth + 1)
+            if inplace:
+                undo = game.make_move(state, a)
+                v2, _ = max_value(state, alpha, beta, depth + 1)
+                game.unmake_move(state, undo)
+            else:
+                v2, _ = max_value(game.result(state, a), alpha, beta, depth + 1)
             if v2 < v:
                 v, move = v2, a
                 beta = min(beta, v)
@@ -158,9 +203,20 @@ def h_alphabeta_search(game, state, cutoff=cutoff_depth(2)):
                 return v, move
         return v, move
 
+    if not inplace:
+        # cache1 usa lo stato come chiave: non si può usare se la board viene modificata sul posto.
+        max_value, min_value = cache1(max_value), cache1(min_value)
+
     return max_value(state, -infinity, +infinity, 0)
 
 
+# Pesi di h, letti anche da boardBatch.h_gallo_mari.
+W_CELLE = 4
+W_PIP = 1.5
+W_CENTRO = 0.5
+W_MOBILITA = 0.2
+W_MINACCE = 1.0
+
 def h(game, state, player):
     opponent = "Red" if player == "Blue" else "Blue"
    
@@ -223,12 +279,12 @@ def h(game, state, player):
     opponent1 = opponent
 
     score = (
-        4 * (player_cells - opponent_cells) +
-        1.5 * (player_pips - opponent_pips) +
-        0.5 * center_control +
-        0.2 * mobility -
-        1.0 * player_threat +
-        1.0 * opponent_threat
+        W_CELLE * (player_cells - opponent_cells) +
+        W_PIP * (player_pips - opponent_pips) +
+        W_CENTRO * center_control +
+        W_MOBILITA * mobility -
+        W_MINACCE * player_threat +
+        W_MINACCE * opponent_threat
     )
     return score
     
@@ -0,0 +1,270 @@
+"""Playout casuali veloci per MCTS: una partita giocata a caso fino alla fine su una board ridotta all'osso.
+
+Il simulate di playingStrategies.monte_carlo_tree_search, a ogni turno di ogni playout, chiede a
+game.actions la lista completa delle mosse (tuple di coordinate, celle catturate, ...) e a
+game.result una board nuova. PlayoutKernel gioca invece su array preallocati che riusa da un
+playout all'altro:
+    code        per cella: pip (0 se vuota) | RED_BIT se è di Red, come nelle PackedBoard
+    keys        per cella: i pip delle celle adiacenti, 3 bit ciascuno
+    empties     le celle vuote, in ordine qualsiasi (una cella si toglie scambiandola con l'ultima)
+    slot        posizione di ogni cella vuota in empties
+    counts      per cella: numero di mosse legali nella cella (0 se occupata)
+Le mosse di una cella vuota dipendono solo dai pip adiacenti: option_tables ne conta il numero
+una volta per dimensione, per ogni chiave possibile, e le mosse (calcolate con BoardTables.moves_for
+alla prima richiesta) restano in cache. Una mossa aggiorna le chiavi e i conteggi delle sole celle
+adiacenti alla cella giocata e a quelle catturate; `total` tiene il numero di mosse legali.
+La mossa si estrae uniformemente tra tutte le mosse legali senza elencarle: si estrae un numero
+in [0, total) e si scorrono le celle vuote sottraendo i loro conteggi, fino alla cella che lo
+contiene; la mossa è poi un elemento della tupla di quella cella.
+Riempite le cache, un playout non crea oggetti.
+
+random_playout(game, state) restituisce il vincitore di un playout da state; playout_benchmark
+misura i playout al secondo rispetto al percorso di game.actions e game.result.
+
+Uso:  python playoutKernel.py [plies] [seconds]
+"""
+
+import itertools
+import random
+import sys
+import threading
+import time
+
+RED_BIT = 8   # come in CephalopodGame: bit di Red nel codice di una cella
+PIP_MASK = 7
+
+
+class PlayoutKernel:
+    """Playout casuali per le board di una dimensione; un PlayoutKernel va usato da un solo
+    thread alla volta, perché gli array sono condivisi tra i playout (kernel ne dà uno per thread).
+    rng è un random.Random o il modulo random."""
+
+    def __init__(self, tables, rng=random):
+        self.size = tables.size
+        self.tables = tables
+        self.rng = rng
+        n = self.size * self.size
+        self.moves, self.n_moves = option_tables(tables)
+        # Per ogni cella j, le celle adiacenti n con lo scostamento dei pip di j nella chiave di n.
+        self.updates = [tuple((m, 3 * tables.neighbours[m].index(j)) for m in tables.neighbours[j])
+                        for j in range(n)]
+        self.code = bytearray(n)
+        self.keys = [0] * n
+        self.empties = [0] * n
+        self.slot = [0] * n
+        self.counts = [0] * n
+        self.n_empty = 0
+        self.total = 0
+        self.pieces = [0, 0]  # celle di Blue e di Red
+        self.side = 0         # 0: tocca a Blue, 1: tocca a Red
+
+    def _moves(self, i):
+        """Calcola e memorizza in moves le mosse della cella vuota i."""
+        key = self.keys[i]
+        adj = self.tables.neighbours[i]
+        pips = tuple(key >> (3 * k) & PIP_MASK for k in range(len(adj)))
+        size = self.size
+        options = self.moves[i][key] = tuple((pip, tuple(r * size + c for r, c in captured))
+                                             for cell, pip, captured in self.tables.moves_for(i, pips))
+        return options
+
+    def load(self, state):
+        """Copia nel kernel la posizione state (Board, PackedBoard o FrozenBoard)."""
+        cells = state.to_packed().cells
+        code, keys, empties, slot, counts = self.code, self.keys, self.empties, self.slot, self.counts
+        self.n_empty = 0
+        self.pieces[0] = self.pieces[1] = 0
+        for i in range(self.size * self.size):
+            v = cells >> (4 * i) & 15
+            code[i] = v
+            keys[i] = 0
+            if v:
+                self.pieces[v >> 3] += 1
+            else:
+                empties[self.n_empty] = i
+                slot[i] = self.n_empty
+                self.n_empty += 1
+        for j, v in enumerate(code):
+            for m, shift in self.updates[j]:
+                keys[m] |= (v & PIP_MASK) << shift
+        total = 0
+        for i, v in enumerate(code):
+            counts[i] = 0 if v else self.n_moves[i][keys[i]]
+            total += counts[i]
+        self.total = total
+        self.side = 1 if state.to_move == "Red" else 0
+
+    def play(self, i, pip, captured):
+        """Gioca nella cella vuota i la mossa (pip, captured) per il giocatore di turno."""
+        code, keys, empties, slot, counts = self.code, self.keys, self.empties, self.slot, self.counts
+        n_moves, updates = self.n_moves, self.updates
+        side = self.side
+        code[i] = pip | (RED_BIT if side else 0)
+        self.pieces[side] += 1
+        # La cella i esce da empties: al suo posto va l'ultima cella vuota.
+        self.n_empty -= 1
+        moved = empties[self.n_empty]
+        empties[slot[i]] = moved
+        slot[moved] = slot[i]
+        total = self.total - counts[i]
+        counts[i] = 0
+        for m, shift in updates[i]:
+            keys[m] += pip << shift
+            if not code[m]:
+                total -= counts[m]
+                counts[m] = n_moves[m][keys[m]]
+                total += counts[m]
+        # Le celle catturate sono adiacenti a i e quindi mai tra loro: la chiave di ognuna è già
+        # quella finale quando la si libera.
+        for j in captured:
+            self.pieces[code[j] >> 3] -= 1
+            removed = code[j] & PIP_MASK
+            code[j] = 0
+            empties[self.n_empty] = j
+            slot[j] = self.n_empty
+            self.n_empty += 1
+            counts[j] = n_moves[j][keys[j]]
+            total += counts[j]
+            for m, shift in updates[j]:
+                keys[m] -= removed << shift
+                if not code[m]:
+                    total -= counts[m]
+                    counts[m] = n_moves[m][keys[m]]
+                    total += counts[m]
+        self.total = total
+        self.side = 1 - side
+
+    def step(self):
+        """Gioca una mossa estratta uniformemente tra quelle legali."""
+        r = int(self.rng.random() * self.total)
+        counts, empties = self.counts, self.empties
+        k = 0
+        while r >= counts[empties[k]]:
+            r -= counts[empties[k]]
+            k += 1
+        i = empties[k]
+        options = self.moves[i][self.keys[i]]
+        if options is None:
+            options = self._moves(i)
+        pip, captured = options[r]
+        self.play(i, pip, captured)
+
+    def winner(self):
+        """Vincitore della posizione finale, come CephalopodGame.utility: Blue vince solo con
+        più celle di Red."""
+        return "Blue" if self.pieces[0] > self.pieces[1] else "Red"
+
+    def run(self, state):
+        """Gioca a caso da state fino alla board piena e restituisce il vincitore."""
+        self.load(state)
+        while self.n_empty:
+            self.step()
+        return self.winner()
+
+
+_option_tables = {}
+
+
+def option_tables(tables):
+    """Tabelle delle mosse per cella delle BoardTables tables, indicizzate dalla chiave dei pip
+    adiacenti (3 bit per adiacente, nell'ordine di tables.neighbours): n_moves[i][key] è il numero
+    di mosse della cella i vuota e moves[i][key] la tupla delle mosse (pip, indici delle celle
+    catturate), None finché PlayoutKernel non la chiede. Il numero di mosse dipende solo dai pip
+    adiacenti: le celle con lo stesso numero di adiacenti condividono la lista n_moves."""
+    size = tables.size
+    if size not in _option_tables:
+        by_degree = {}
+        for i, adj in enumerate(tables.neighbours):
+            if len(adj) not in by_degree:
+                counts = [0] * (1 << 3 * len(adj))
+                for pips in itertools.product(range(PIP_MASK), repeat=len(adj)):
+                    counts[pip_key(pips)] = len(tables.moves_for(i, pips))
+                by_degree[len(adj)] = counts
+        moves = [[None] * (1 << 3 * len(adj)) for adj in tables.neighbours]
+        n_moves = [by_degree[len(adj)] for adj in tables.neighbours]
+        _option_tables[size] = moves, n_moves
+    return _option_tables[size]
+
+
+def pip_key(pips):
+    """Chiave dei pip adiacenti: pips[k] nei bit 3k .. 3k+2."""
+    key = 0
+    for pip in reversed(pips):
+        key = key << 3 | pip
+    return key
+
+
+_local = threading.local()
+
+
+def kernel(game):
+    """PlayoutKernel del thread corrente per le board di game (uno per dimensione)."""
+    kernels = getattr(_local, "kernels", None)
+    if kernels is None:
+        kernels = _local.kernels = {}
+    k = kernels.get(game.tables.size)
+    if k is None:
+        k = kernels[game.tables.size] = PlayoutKernel(game.tables)
+    return k
+
+
+def random_playout(game, state):
+    """Vincitore ("Blue" o "Red") di una partita giocata a caso da state."""
+    return kernel(game).run(state)
+
+
+def _result_playout(game, state):
+    """Il percorso di simulate in monte_carlo_tree_search prima del kernel."""
+    while not game.is_terminal(state):
+        state = game.result(state, random.choice(list(game.actions(state))))
+    return "Blue" if game.utility(state, "Blue") > 0 else "Red"
+
+
+def _make_move_playout(game, state):
+    """Il percorso di ArrayTree._simulate prima del kernel: mosse sul posto su una copia."""
+    state = state.copy()
+    while not game.is_terminal(state):
+        game.make_move(state, random.choice(game.actions(state)))
+    return "Blue" if game.utility(state, "Blue") > 0 else "Red"
+
+
+def playout_benchmark(game, plies=0, seconds=2.0, samples=5, seed=0, verbose=True):
+    """Playout al secondo di game.actions + game.result (su Board e PackedBoard), di
+    game.make_move e di random_playout, da `samples` posizioni raggiunte con `plies` mosse a
+    caso; ogni percorso gioca per circa `seconds` secondi. Restituisce {nome: playout al secondo}."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < samples:
+        state = game.initial
+        for _ in range(plies):
+            if game.is_terminal(state):
+                break
+            state = game.result(state, rng.choice(game.actions(state)))
+        if not game.is_terminal(state):
+            positions.append(state)
+    paths = [("result (Board)", _result_playout, lambda s: s),
+             ("result (PackedBoard)", _result_playout, lambda s: s.to_packed()),
+             ("make_move (PackedBoard)", _make_move_playout, lambda s: s.to_packed()),
+             ("kernel", random_playout, lambda s: s)]
+    rates = {}
+    for name, playout, convert in paths:
+        states = [convert(state) for state in positions]
+        random.seed(seed)
+        n = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            for state in states:
+                playout(game, state)
+            n += len(states)
+        rates[name] = n / (time.perf_counter() - start)
+        if verbose:
+            print("%-24s %9.0f playout/s  x%.1f" % (name, rates[name], rates[name] / rates[paths[0][0]]))
+    return rates
+
+
+if __name__ == "__main__":
+    from CephalopodGame import CephalopodGame
+    plies = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    playout_benchmark(CephalopodGame(), plies, seconds)
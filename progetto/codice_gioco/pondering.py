@@ -0,0 +1,156 @@
+"""Pondering: il giocatore continua a cercare mentre muove l'avversario.
+
+La GUI chiama playerStrategy solo quando tocca al giocatore, quindi senza pondering il suo
+processore resta fermo per metà della partita. Ponderer.play restituisce la mossa come un
+normale playerStrategy e subito dopo avvia un thread che cerca la posizione lasciata
+all'avversario, salvando il lavoro in una cache che resta tra una chiamata e l'altra:
+la tabella di trasposizione per AlphaBetaEngine, l'albero per MCTSEngine.
+Alla chiamata successiva il thread viene fermato (cancellazione cooperativa con un
+threading.Event, controllato dalle ricerche a ogni nodo o a ogni playout) e:
+  - se la posizione arrivata era stata prevista (ponder hit) la ricerca riparte dalla cache;
+  - altrimenti il lavoro sulla previsione viene scartato.
+
+AlphaBetaEngine ha due modalità: con predict=True cerca la posizione dopo la risposta prevista
+(la mossa migliore dell'avversario nella tabella di trasposizione), con predict=False cerca la
+posizione dell'avversario, cioè tutte le risposte insieme. MCTSEngine fa crescere l'albero
+della posizione dell'avversario e al proprio turno riparte dal nipote corrispondente alla
+posizione arrivata (confrontando le chiavi, non gli oggetti).
+
+I thread condividono il GIL: il pondering rende solo se l'avversario gioca in un altro processo
+(come in gara). Nella GUI, con due AI nello stesso processo, toglierebbe tempo all'avversario.
+"""
+
+import threading
+import time
+
+import playingStrategies
+from utils4e import MCT_Node
+
+PONDER_MAX_DEPTH = 32  # limite dell'approfondimento iterativo durante il pondering
+
+
+class AlphaBetaEngine:
+    """Negamax ad approfondimento iterativo (playingStrategies.iterative_negamax_search) con
+    tabella di trasposizione e ordinamento delle mosse che restano tra una mossa e l'altra.
+    h e le altre opzioni vanno a negamax_search."""
+
+    def __init__(self, game, h=None, predict=True, **options):
+        self.game = game
+        self.h = h
+        self.predict = predict
+        self.options = options
+        self.tt = playingStrategies.TranspositionTable()
+        self.ordering = playingStrategies.MoveOrdering()
+        self.pondered = None  # posizione su cui si è fatto pondering
+
+    def think(self, state, deadline):
+        value, move = playingStrategies.iterative_negamax_search(
+            self.game, state, self.h, deadline=deadline, tt=self.tt, ordering=self.ordering, **self.options)
+        return move
+
+    def ponder(self, state, stop):
+        """Cerca per il giocatore che ha appena mosso, finché stop non viene impostato."""
+        player = "Red" if state.to_move == "Blue" else "Blue"
+        if self.predict:
+            entry = self.tt.lookup(state.key ^ playingStrategies.POV_KEYS[player])
+            if entry is not None and entry.move is not None:
+                state = self.game.result(state, entry.move)
+                if self.game.is_terminal(state):
+                    return
+        self.pondered = state
+        playingStrategies.iterative_negamax_search(
+            self.game, state, self.h, max_depth=PONDER_MAX_DEPTH, tt=self.tt, ordering=self.ordering,
+            player=player, stop=stop, **self.options)
+
+    def hit(self, state):
+        """True se il pondering ha riguardato state (o, senza previsione, la posizione precedente)."""
+        pondered = self.pondered
+        if pondered is None:
+            return False
+        if pondered.to_move == state.to_move:
+            return pondered.key == state.key
+        return any(self.game.result(pondered, a).key == state.key for a in self.game.actions(pondered))
+
+    def discard(self):
+        # La tabella si tiene comunque: le voci di posizioni non raggiunte non danno risposte sbagliate.
+        self.pondered = None
+
+
+class MCTSEngine:
+    """playingStrategies.monte_carlo_tree_search con l'albero conservato tra una mossa e
+    l'altra: a ogni turno si arriva a `playouts` playout nella radice, se la scadenza lo permette."""
+
+    def __init__(self, game, playouts=2000):
+        self.game = game
+        self.playouts = playouts
+        self.root = None
+
+    def think(self, state, deadline):
+        # Dopo il pondering la radice è la posizione dell'avversario: state è uno dei suoi figli.
+        root = playingStrategies.mcts_subtree(self.root, state, 1) or MCT_Node(state=state)
+        self.root = root
+        move = playingStrategies.monte_carlo_tree_search(state, self.game, max(1, self.playouts - root.N),
+                                                         root=root, deadline=deadline)
+        # La mossa scelta diventa la radice del pondering.
+        self.root = next(child for child, action in root.children.items() if action == move)
+        self.root.parent = None
+        return move
+
+    def ponder(self, state, stop):
+        if self.root is None or self.root.state.key != state.key:
+            self.root = MCT_Node(state=state)
+        playingStrategies.monte_carlo_tree_search(state, self.game, None, root=self.root, stop=stop)
+
+    def hit(self, state):
+        return self.root is not None and any(child.state.key == state.key for child in self.root.children)
+
+    def discard(self):
+        self.root = None
+
+
+class Ponderer:
+    """Gioca con engine (AlphaBetaEngine o MCTSEngine) e fa pondering tra una mossa e l'altra.
+    play(state) segue il contratto di playerStrategy; hits e misses contano i ponder hit."""
+
+    def __init__(self, game, engine, time_limit=playingStrategies.TIME_LIMIT):
+        self.game = game
+        self.engine = engine
+        self.time_limit = time_limit
+        self.thread = None
+        self.stop_event = None
+        self.hits = self.misses = 0
+
+    def play(self, state):
+        deadline = time.perf_counter() + self.time_limit
+        if self.stop():
+            if self.engine.hit(state):
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.engine.discard()
+        move = self.engine.think(state, deadline)
+        following = self.game.result(state, move)
+        if not self.game.is_terminal(following):
+            self.start(following)
+        return move
+
+    def start(self, state):
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.engine.ponder, args=(state, self.stop_event), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Ferma il pondering in corso e ne attende la fine; restituisce False se non ce n'era."""
+        if self.thread is None:
+            return False
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        return True
+
+
+def ponderer(game, make_engine):
+    """Ponderer di game con il motore make_engine(game), uno per partita e per modulo che definisce
+    make_engine (il giocatore), creato con playingStrategies.per_game."""
+    return playingStrategies.per_game(game, make_engine.__module__,
+                                      lambda game: Ponderer(game, make_engine(game)))